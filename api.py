@@ -0,0 +1,70 @@
+import hashlib
+
+from cube import COUNT_AXES
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+# dimensions the aggregate API groups the visit counts by; country and continent are both read from the
+# location axis of the count cube, the others are axes of their own
+AGGREGATE_DIMENSIONS = ['day', 'sporting_event', 'country', 'continent', 'hour', 'age', 'gender', 'income_status']
+
+# media types of the aggregate API responses
+JSON_MIMETYPE = "application/json"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+
+# function to parse the values of a repeatable query parameter, each of which may also be a comma-separated
+# list (e.g. ?country=France&country=Kenya or ?country=France,Kenya); None when none are given
+def parse_list(values):
+    parsed = [value.strip() for text in values for value in text.split(',') if value.strip()]
+    return parsed or None
+
+
+# function to parse the group_by query parameter into a list of dimensions, in the given order; raises
+# ValueError for unknown or repeated dimensions, and for more than one of the dimensions the count cube
+# counts separately (see COUNT_AXES)
+def parse_group_by(values):
+    group_by = parse_list(values) or []
+    unknown = [dimension for dimension in group_by if dimension not in AGGREGATE_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"unknown group_by dimensions {', '.join(unknown)}; "
+                         f"expected some of {', '.join(AGGREGATE_DIMENSIONS)}")
+    if len(set(group_by)) < len(group_by):
+        raise ValueError("group_by dimensions must not repeat")
+    if len(set(group_by) & set(COUNT_AXES)) > 1:
+        raise ValueError(f"group_by takes at most one of {', '.join(COUNT_AXES)}")
+    return group_by
+
+
+# function to pick the response format, from the format query parameter or else the Accept header;
+# raises ValueError for an unknown format, or for Arrow when pyarrow is not installed
+def response_format(format_name, accept_mimetypes):
+    if format_name is None:
+        format_name = 'arrow' if accept_mimetypes.best_match([JSON_MIMETYPE, ARROW_MIMETYPE]) == ARROW_MIMETYPE else 'json'
+    if format_name not in ('json', 'arrow'):
+        raise ValueError(f"unknown format {format_name}; expected json or arrow")
+    if format_name == 'arrow' and pyarrow is None:
+        raise ValueError("Arrow output requires the optional pyarrow package")
+    return format_name
+
+
+# function to encode a frame of aggregates as a JSON array of records or an Arrow IPC stream, returns the
+# body and its media type
+def encode_frame(frame, format_name):
+    if format_name == 'arrow':
+        table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), ARROW_MIMETYPE
+    return frame.to_json(orient='records').encode(), JSON_MIMETYPE
+
+
+# function to derive the entity tag of a response from everything it depends on (the data version, the
+# filter key, the dimensions and the format), so an unchanged query is answered 304 without computing it
+def entity_tag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
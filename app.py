@@ -1,9 +1,28 @@
-from dash import Dash, dcc, html, Input, Output
+from dash import Dash, dcc, html, Input, Output, State, Patch, ClientsideFunction, no_update
 from dash_bootstrap_templates import load_figure_template
+from flask import Response, jsonify, request
 import pandas as pd
 import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
+import base64
+import functools
+import logging
+import os
+import threading
+
+from api import encode_frame, entity_tag, parse_group_by, parse_list, response_format
+from cube import (COUNT_AXES, DEFAULT_AGE_EDGES, MINUTES_PER_DAY, CountCube, age_histogram, minute_prefix_sums,
+                  peak_windows, window_counts)
+from dimension_index import DimensionIndex
+from datastore import dataset_version, date_of_day, day_of_date, format_ip_addresses, load_data, log_files
+from heavy_hitters import DEFAULT_CAPACITY, TrafficSummary
+from ingest import LogTailer
+from ip_index import address_range, parse_cidr
+from partitions import DEFAULT_CHUNK_ROWS, load_partitions
+from metrics import CallbackMetrics
+from result_cache import ResultCache, DEFAULT_MAX_BYTES, cache_path, private_directory
 
 templates = [
     "pulse"
@@ -12,10 +31,17 @@ templates = [
 load_figure_template(templates)
 
 
-data = pd.read_csv("fun_olympics.csv")
+# path of the log, a CSV file or a directory of CSV shards
+data_path = os.environ.get("FUN_OLYMPICS_DATA", "fun_olympics.csv")
 
-# convert time column to datetime
-data['time'] = pd.to_datetime(data['time'], format="mixed")
+# filter result cache shared by all callbacks and gunicorn workers
+result_cache = ResultCache(os.environ.get("FUN_OLYMPICS_CACHE", os.path.join(cache_path(data_path), "results.sqlite")),
+                           int(os.environ.get("FUN_OLYMPICS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)))
+
+# per-callback phase timings, rows scanned and response sizes, served on /metrics; callbacks slower
+# than FUN_OLYMPICS_SLOW_REQUEST_SECONDS are logged with their filters and phase timings
+slow_request_seconds = os.environ.get("FUN_OLYMPICS_SLOW_REQUEST_SECONDS")
+callback_metrics = CallbackMetrics(float(slow_request_seconds) if slow_request_seconds else None)
 
 # sporting events aliases
 sporting_events = {
@@ -38,42 +64,810 @@ sporting_events = {
     "/hockey": "Hockey"
 }
 
-# group data by sporting event
-data['sporting_event'] = data['path'].map(sporting_events)
-path_requests = data.groupby('sporting_event').size().reset_index(name='n')
-path_requests = path_requests.drop(path_requests[path_requests['sporting_event'] == 'Other'].index)
 
-# age groups
-data['age_group'] = pd.cut(data['age'], bins=[0, 24, 34, 44, 54, 64, float('inf')],
-                           labels=["16-24", "25-34", "35-44", "45-54", "55-64", "65+"])
+# function to add the sporting event column to a log frame
+def add_derived_columns(frame):
+    frame['sporting_event'] = frame['path'].map(sporting_events).astype(pd.CategoricalDtype(sorted(sporting_events.values())))
+    return frame
+
+
+# out-of-core mode: the log is converted in chunks into on-disk partitions per day, sporting event and hour,
+# and the count cube every chart is answered from is built by streaming the partitions chunk by chunk, so
+# no rows are kept in memory; the sparse minute counts and viewer sketches of the cube still grow with the log
+out_of_core = os.environ.get("FUN_OLYMPICS_OUT_OF_CORE") == "1"
+chunk_rows = int(os.environ.get("FUN_OLYMPICS_CHUNK_ROWS", DEFAULT_CHUNK_ROWS))
+
+# heavy hitter summaries of the IP addresses and of the paths of each error status, fed every row as the
+# log is loaded and as live rows are ingested, so the traffic panels never scan the rows
+traffic = TrafficSummary(int(os.environ.get("FUN_OLYMPICS_HEAVY_HITTER_COUNTERS", DEFAULT_CAPACITY)))
+
 
+# function to add a stream of log frames to the traffic summaries as they pass
+def summarize_traffic(frames):
+    for frame in frames:
+        traffic.add_frame(frame)
+        yield frame
 
-# function to calculate peak viewing time
-def calculate_peak_viewing_time(hourly_requests):
-    peak_hour_index = np.argmax(hourly_requests['count'])
-    peak_hour = hourly_requests.loc[peak_hour_index, 'time']
-    return peak_hour
+
+if out_of_core:
+    partitioned_log = load_partitions(data_path, add_derived_columns, chunk_rows)
+    data = None
+    log_source = partitioned_log.source
+
+    # count cube of the log, so the charts are answered from pre-aggregated counts
+    cube = CountCube.from_frames(summarize_traffic(partitioned_log.chunks(partitioned_log.partitions, chunk_rows)),
+                                 sporting_events.values(), partitioned_log.locations, partitioned_log.ages,
+                                 sorted(partitioned_log.categories['gender']),
+                                 sorted(partitioned_log.categories['income_status']))
+else:
+    # load the log through its memory-mapped columnar snapshot; dates are days since 1970-01-01 and times
+    # are seconds since midnight, and the rows are stored by day
+    data, log_source, ip_index = load_data(data_path)
+    data = add_derived_columns(data)
+
+    # count cube of the log, so the charts are answered from pre-aggregated counts
+    cube = CountCube.from_frame(data, sporting_events.values())
+    for start in range(0, len(data), chunk_rows):
+        traffic.add_frame(data.iloc[start:start + chunk_rows])
+
+# dataset version of the loaded snapshot (or partitions), so cached results are never reused across
+# different log files, nor between workers which loaded different versions of the log
+data_version = dataset_version(data_path, log_source)
+
+# group data by sporting event
+path_requests = pd.DataFrame({'sporting_event': cube.sporting_events[:-1], 'n': cube.sum(('sporting_event',))[:-1]})
+path_requests = path_requests[path_requests['n'] > 0].sort_values('sporting_event').reset_index(drop=True)
+path_requests = path_requests.drop(path_requests[path_requests['sporting_event'] == 'Other'].index)
+
+# live mode: tail the log (its last shard for a shard directory) from the end of the loaded
+# snapshot (or partitions), and add newly appended lines to the aggregates instead of reloading
+live_mode = os.environ.get("FUN_OLYMPICS_LIVE") == "1"
+live_interval = int(os.environ.get("FUN_OLYMPICS_LIVE_INTERVAL", 5000))
+live_tailer = LogTailer(log_files(data_path)[-1], offset=log_source[-1][2]) if live_mode else None
+live_lock = threading.Lock()
+
+
+# function to replace the locks of the live data and the metrics in a forked child process (such as the
+# process of a background callback job), where a lock held by another thread at the fork would never be released
+def reset_locks():
+    global live_lock
+    live_lock = threading.Lock()
+    callback_metrics.lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=reset_locks)
+
+# progress reporter of the running background callback job (see background_callback), None outside a job,
+# and the last progress it reported
+job_progress = {'report': None, 'last': None}
+
+
+# function to report the progress of the running background callback job as the fraction of its stages done,
+# shown with the label of the stage starting on the progress bar of its figure; every report is written to
+# the disk cache of the job, so only changes of a whole percent or of the label are reported
+def report_progress(fraction, label):
+    progress = (int(fraction * 100), label)
+    if job_progress['report'] is not None and progress != job_progress['last']:
+        job_progress['last'] = progress
+        job_progress['report']((progress[0], f"{label} ({progress[0]}%)"))
+
+# IP address, date, time and status code of the live rows, sorted by IP address, for the network range box;
+# every other chart is answered from the aggregates the live rows are added to
+LIVE_REQUEST_DTYPE = np.dtype([('date', np.int32), ('time', np.int32), ('ip_address', np.uint32),
+                               ('status_code', np.int16)])
+live_requests = np.zeros(0, dtype=LIVE_REQUEST_DTYPE)
+
+
+# function to bring the aggregates up to date with the live log, returns the current data version
+@callback_metrics.timed('ingest')
+def sync_live_data():
+    global live_requests
+    if live_tailer is None:
+        return data_version
+    with live_lock:
+        for batch in live_tailer.poll():
+            batch = add_derived_columns(batch)
+            skipped = cube.add_frame(batch)
+            if skipped:
+                logging.warning("skipped %d live log rows with values outside the count cube", skipped)
+            traffic.add_frame(batch)
+            requests = np.empty(len(batch), dtype=LIVE_REQUEST_DTYPE)
+            for name in LIVE_REQUEST_DTYPE.names:
+                requests[name] = batch[name].to_numpy()
+            requests = requests[np.argsort(requests['ip_address'], kind='stable')]
+            live_requests = np.insert(live_requests, np.searchsorted(live_requests['ip_address'],
+                                                                     requests['ip_address'], side='right'), requests)
+        return data_version, live_tailer.rows
+
+
+# function to sum the up-to-date count cube over the selected filters; the cube is read under the live
+# lock, since live rows of a new day extend its day axis
+@callback_metrics.timed('aggregate')
+def cube_sum(keep, selected_sporting_events, selected_countries, selected_continents, selected_days):
+    sync_live_data()
+    with live_lock:
+        return cube.sum(keep, selected_sporting_events, selected_countries, selected_continents, selected_days)
+
+
+# function to convert the dates of a date picker into a (first, last) range of day numbers, either end
+# None when it is not picked; None when no date is picked
+def day_range(start_date, end_date):
+    if start_date is None and end_date is None:
+        return None
+    return tuple(None if date is None else day_of_date(date) for date in (start_date, end_date))
+
+
+# function to get the (first, last) minutes of the time of day window picked on the slider, None when the
+# whole day is picked
+def time_window(time_range):
+    if not time_range or (time_range[0] <= 0 and time_range[1] >= MINUTES_PER_DAY):
+        return None
+    return int(time_range[0]), int(time_range[1])
+
+
+# function to get the mask of the bins between the given minutes of day overlapping a time of day window
+def window_overlap(edges, window):
+    first, last = window or (0, MINUTES_PER_DAY)
+    return (edges[1:] > first) & (edges[:-1] < last)
+
+
+# number of peak viewing windows reported in the Peak Viewing Time card and marked on the hourly chart
+num_peak_windows = 3
 
 
 # function to calculate the most popular sporting event
-def calculate_most_popular_sporting_event(filtered_data):
-    event_counts = filtered_data['sporting_event'].value_counts()
+def calculate_most_popular_sporting_event(sporting_event_requests):
+    event_counts = sporting_event_requests.set_index('sporting_event')['count']
+    if event_counts.empty:
+        return "-"
     most_popular_event = event_counts.idxmax()
     return most_popular_event
 
 
+# function to format a peak viewing window, with its date when the selected days are several
+def format_peak_window(peak, multiple_days):
+    return f"{peak.start.strftime('%b %d, %H:%M' if multiple_days else '%H:%M')}-{peak.end.strftime('%H:%M')}"
+
+
+# function to format the busiest peak viewing window, and the list of the peak windows with their visits
+def format_peak_viewing_time(peaks):
+    windows = [format_peak_window(peak, peaks['multiple_days']) for peak in peaks['peaks'].itertuples()]
+    return (windows[0] if windows else "-",
+            html.Ol([html.Li(f"{window} ({peak.count:,} visits)")
+                     for window, peak in zip(windows, peaks['peaks'].itertuples())], className="small mb-0"))
+
+
+# function to normalize dropdown selections (sorted and de-duplicated) and the selected range of days into
+# a cache key
+def filter_key(selected_sporting_events, selected_countries, selected_continents, selected_days=None):
+    return tuple(tuple(sorted(set(selected))) if selected else ()
+                 for selected in (selected_sporting_events, selected_countries, selected_continents)) + (
+        tuple(selected_days) if selected_days else (),)
+
+
+# columns of the log rows the network range box reads
+IP_RANGE_COLUMNS = ['date', 'time', 'ip_address', 'status_code']
+
+
+# function to get the log rows within a (first, last) range of IP addresses as frames of the network range
+# columns, at most chunk_rows rows each, so a wide range is never copied whole: in memory the slice of the
+# sorted IP index gives their positions, out of core every partition (sorted by IP address) is binary
+# searched, and so are the live rows
+def get_ip_range_frames(first, last):
+    if data is None:
+        for frame in partitioned_log.chunks(partitioned_log.partitions, chunk_rows, (first, last)):
+            callback_metrics.add_rows_scanned(len(frame))
+            yield frame[IP_RANGE_COLUMNS]
+    else:
+        positions = address_range(ip_index.sorted_addresses, first, last)
+        for start in range(positions.start, positions.stop, chunk_rows):
+            rows = np.sort(ip_index.rows[start:min(start + chunk_rows, positions.stop)])
+            callback_metrics.add_rows_scanned(len(rows))
+            yield pd.DataFrame({name: data[name].to_numpy()[rows] for name in IP_RANGE_COLUMNS})
+    requests = live_requests[address_range(live_requests['ip_address'], first, last)]
+    for start in range(0, len(requests), chunk_rows):
+        yield pd.DataFrame(requests[start:start + chunk_rows])
+
+
+# function to get the requests from a (first, last) range of IP addresses: their number, the number of
+# distinct addresses sending them and their hourly counts by status code, summed chunk by chunk so
+# only the distinct addresses of the range are held at once
+@callback_metrics.timed('filter')
+def get_ip_range_stats(first, last):
+    def compute():
+        requests, addresses, hourly = 0, np.zeros(0, dtype=np.uint32), []
+        sync_live_data()
+        with live_lock:
+            for frame in get_ip_range_frames(first, last):
+                requests += len(frame)
+                addresses = np.union1d(addresses, frame['ip_address'].to_numpy())
+                hours = frame['date'].to_numpy().astype(np.int64) * 24 + frame['time'].to_numpy() // 3600
+                hourly.append(frame.groupby([hours, 'status_code']).size())
+        if hourly:
+            hourly = pd.concat(hourly).groupby(level=[0, 1]).sum().reset_index(name='count')
+        else:
+            hourly = pd.DataFrame({'hour': [], 'status_code': [], 'count': []}, dtype=np.int64)
+        return {
+            'requests': requests,
+            'addresses': len(addresses),
+            'hourly': pd.DataFrame({'time': pd.to_datetime(hourly.iloc[:, 0], unit='h'),
+                                    'status_code': hourly['status_code'].astype(str), 'count': hourly['count']}),
+        }
+
+    return result_cache.get_or_compute(('ip_range', sync_live_data(), first, last), compute)
+
+
+# function to get the visit counts per value of a cube axis for the selected filters
+@callback_metrics.timed('aggregate')
+def get_requests(axis, labels, selected_sporting_events, selected_countries, selected_continents, selected_days):
+    counts = cube_sum((axis,), selected_sporting_events, selected_countries, selected_continents, selected_days)
+    requests = pd.DataFrame({axis: labels, 'count': counts})
+    return requests[requests['count'] > 0].reset_index(drop=True)
+
+
+# function to parse the upper edges of the age bins typed in the dashboard (e.g. "24, 34, 44"),
+# None when they are not whole numbers
+def parse_age_edges(text):
+    try:
+        return sorted({int(edge) for edge in (text or "").replace(',', ' ').split()})
+    except ValueError:
+        return None
+
+
+# function to get the visit counts of the age bins within the selected age range, binned from the per-age
+# counts of the filters (the default age groups when the edges are malformed)
+@callback_metrics.timed('aggregate')
+def get_age_requests(age_counts, age_range, age_edges):
+    first, last = age_range or (cube.ages[0], cube.ages[-1])
+    edges = parse_age_edges(age_edges)
+    labels, counts = age_histogram(cube.ages, age_counts, int(first), int(last),
+                                   DEFAULT_AGE_EDGES if edges is None else edges)
+    return pd.DataFrame({'age_group': labels, 'count': counts})
+
+
+# function to get the visit counts of every country, in country order, for the selected filters
+@callback_metrics.timed('aggregate')
+def get_country_requests(selected_sporting_events, selected_countries, selected_continents, selected_days):
+    counts = cube_sum(('location',), selected_sporting_events, selected_countries, selected_continents, selected_days)
+    requests = pd.DataFrame({'country': cube.locations['country'], 'count': counts})
+    return requests.groupby('country', observed=True).sum().reset_index()
+
+
+# function to get the visit counts per sporting event for the selected filters, within a time of day window
+@callback_metrics.timed('aggregate')
+def get_sporting_event_requests(selected_sporting_events, selected_countries, selected_continents, selected_days,
+                                window=None):
+    if window is None:
+        counts = cube_sum(('sporting_event',), selected_sporting_events, selected_countries, selected_continents,
+                          selected_days)[:-1]
+    else:
+        prefix_sums, _ = get_minute_prefix_sums(selected_sporting_events, selected_countries, selected_continents,
+                                                selected_days)
+        counts = window_counts(prefix_sums, np.array([0, MINUTES_PER_DAY]), *window).sum(axis=(1, 2))[:-1]
+    requests = pd.DataFrame({'sporting_event': cube.sporting_events[:-1], 'count': counts})
+    requests = requests[requests['count'] > 0].sort_values('count', ascending=False, kind='stable')
+    return requests.reset_index(drop=True)
+
+
+# function to get the hourly visit counts of each selected day for the selected filters; within a time of day
+# window only the hours overlapping it are kept, counting their visits inside it
+@callback_metrics.timed('aggregate')
+def get_hourly_requests(selected_sporting_events, selected_countries, selected_continents, selected_days,
+                        window=None):
+    if window is not None:
+        prefix_sums, days = get_minute_prefix_sums(selected_sporting_events, selected_countries, selected_continents,
+                                                   selected_days)
+        edges = np.arange(0, MINUTES_PER_DAY + 1, 60)
+        return hourly_frame(days, window_counts(prefix_sums, edges, *window).sum(axis=0), window)
+    sync_live_data()
+    with live_lock:
+        counts = cube.sum(('day', 'hour'), selected_sporting_events, selected_countries, selected_continents,
+                          selected_days)
+        days = cube.days_in(selected_days)
+    return hourly_frame(days, counts)
+
+
+# function to get the prefix sums of the per-minute visit counts of each sporting event and selected day for
+# the selected filters (see minute_prefix_sums), and the selected days
+@callback_metrics.timed('aggregate')
+def get_minute_prefix_sums(selected_sporting_events, selected_countries, selected_continents, selected_days):
+    key = filter_key(selected_sporting_events, selected_countries, selected_continents, selected_days)
+
+    def compute():
+        sync_live_data()
+        with live_lock:
+            counts = cube.sum_minutes(1, *key)
+            days = cube.days_in(key[3])
+        return minute_prefix_sums(counts), days
+
+    return result_cache.get_or_compute(('minutes', sync_live_data(), key), compute)
+
+
+# function to build the hourly counts of the given days from their counts per day and hour, keeping the hours
+# overlapping a time of day window
+def hourly_frame(days, counts, window=None):
+    kept = window_overlap(np.arange(0, MINUTES_PER_DAY + 1, 60), window)
+    hours = (days[:, np.newaxis] * 24 + cube.hours[kept]).reshape(-1)
+    return pd.DataFrame({'time': pd.to_datetime(hours, unit='h'), 'count': counts[:, kept].reshape(-1)})
+
+
+# function to get the estimated unique viewers (distinct IP addresses) of the selected filters, in total and
+# per hour of each selected day, merged from the viewer sketches of the count cube; the sketches are kept per
+# hour, so a time of day window counts the viewers of the whole hours overlapping it
+@callback_metrics.timed('aggregate')
+def get_unique_viewer_stats(selected_sporting_events, selected_countries, selected_continents, selected_days,
+                            window=None):
+    key = filter_key(selected_sporting_events, selected_countries, selected_continents, selected_days)
+
+    def compute():
+        hours = None
+        if window is not None:
+            hours = cube.hours[window_overlap(np.arange(0, MINUTES_PER_DAY + 1, 60), window)]
+        sync_live_data()
+        with live_lock:
+            unique_viewers = cube.unique_viewers((), *key, hours)
+            hourly_unique_viewers = cube.unique_viewers(('day', 'hour'), *key, hours)
+            days = cube.days_in(key[3])
+        return {
+            'unique_viewers': int(unique_viewers),
+            'hourly_unique_viewers': hourly_frame(days, hourly_unique_viewers, window),
+        }
+
+    return result_cache.get_or_compute(('unique', sync_live_data(), key, window), compute)
+
+
+# function to get the estimated unique viewers of every country, in country order, for the selected filters
+@callback_metrics.timed('aggregate')
+def get_country_unique_viewers(selected_sporting_events, selected_countries, selected_continents, selected_days):
+    key = filter_key(selected_sporting_events, selected_countries, selected_continents, selected_days)
+
+    def compute():
+        sync_live_data()
+        with live_lock:
+            counts = cube.unique_viewers(('country',), *key)
+        return pd.DataFrame({'country': cube.countries, 'count': counts})
+
+    return result_cache.get_or_compute(('unique_country', sync_live_data(), key), compute)
+
+
+# function to get the visit counts of the sporting events with any visits, binned over the selected days at
+# the given resolution in minutes from the prefix sums of the minute counts, for the selected filters;
+# returns the event names, an events x bins matrix and the start of the first bin. Within a time of day
+# window the bins outside it are left blank (NaN)
+@callback_metrics.timed('aggregate')
+def get_concurrent_sporting_events(resolution, selected_sporting_events, selected_countries, selected_continents,
+                                   selected_days, window=None):
+    key = filter_key(selected_sporting_events, selected_countries, selected_continents, selected_days)
+
+    def compute():
+        prefix_sums, days = get_minute_prefix_sums(*key)
+        edges = np.arange(0, MINUTES_PER_DAY + 1, resolution)
+        counts = window_counts(prefix_sums, edges, *(window or ()))[:-1]
+        events = np.flatnonzero(counts.sum(axis=(1, 2)))
+        counts = counts[events].astype(np.int32)
+        if window is not None:
+            counts = counts.astype(np.float32)
+            counts[:, :, ~window_overlap(edges, window)] = np.nan
+        start = date_of_day(days[0]) if len(days) else None
+        return ([cube.sporting_events[event] for event in events],
+                counts.reshape(len(events), counts.shape[1] * counts.shape[2]), start)
+
+    return result_cache.get_or_compute(('concurrent', sync_live_data(), key, resolution, window), compute)
+
+
+# function to get the IP addresses with the most requests from their heavy hitter summary, with the most
+# their counts can fall short by
+@callback_metrics.timed('aggregate')
+def get_top_ip_addresses(n):
+    sync_live_data()
+    with live_lock:
+        top = traffic.ip_addresses.top(n)
+        error = traffic.ip_addresses.subtracted
+    return top.assign(value=format_ip_addresses(top['value'])), error
+
+
+# function to get the error statuses with a heavy hitter summary of their paths
+@callback_metrics.timed('aggregate')
+def get_error_statuses():
+    sync_live_data()
+    with live_lock:
+        return sorted(traffic.error_paths)
+
+
+# function to get the paths with the most requests of an error status from their heavy hitter summary, with
+# the most their counts can fall short by
+@callback_metrics.timed('aggregate')
+def get_top_error_paths(status_code, n):
+    sync_live_data()
+    with live_lock:
+        summary = traffic.error_paths.get(status_code)
+        if summary is None:
+            return pd.DataFrame({'value': [], 'count': [], 'error': []}), 0
+        return summary.top(n), summary.subtracted
+
+
+# function to get the busiest non-overlapping windows of the given width in minutes over the selected days, for
+# the selected filters, from the prefix sums of the minute counts; windows may span midnight between two
+# selected days. Within a time of day window, the peaks lie inside the window of one day, and are at most
+# as wide as the window
+@callback_metrics.timed('aggregate')
+def get_peak_windows(selected_sporting_events, selected_countries, selected_continents, selected_days, window=None,
+                     width=60):
+    key = filter_key(selected_sporting_events, selected_countries, selected_continents, selected_days)
+
+    def compute():
+        prefix_sums, days = get_minute_prefix_sums(*key)
+        if not len(days):
+            return {'peaks': pd.DataFrame({'start': pd.to_datetime([]), 'end': pd.to_datetime([]), 'count': []}),
+                    'multiple_days': False}
+        counts = np.diff(prefix_sums.sum(axis=0), axis=1).reshape(-1)
+        peak_width, allowed = width, None
+        if window is not None:
+            first, last = window
+            peak_width = min(width, last - first)
+            start_minutes = np.arange(len(counts) - peak_width + 1) % MINUTES_PER_DAY
+            allowed = (start_minutes >= first) & (start_minutes + peak_width <= last)
+        peaks = peak_windows(counts, peak_width, num_peak_windows, allowed)
+        starts = pd.to_timedelta([start for start, _ in peaks], unit='m') + date_of_day(days[0])
+        return {
+            'peaks': pd.DataFrame({'start': starts, 'end': starts + pd.Timedelta(minutes=peak_width),
+                                   'count': [visits for _, visits in peaks]}),
+            'multiple_days': len(days) > 1,
+        }
+
+    return result_cache.get_or_compute(('peaks', sync_live_data(), key, window, width), compute)
+
+
+# function to get the Viewership Statistics aggregates for the selected filters, within a time of day window
+@callback_metrics.timed('aggregate')
+def get_viewership_stats(selected_sporting_events, selected_countries, selected_continents, selected_days,
+                         window=None):
+    key = filter_key(selected_sporting_events, selected_countries, selected_continents, selected_days)
+
+    def compute():
+        hourly_requests = get_hourly_requests(*key, window)
+        return {
+            'total_requests': int(hourly_requests['count'].sum()),
+            'hourly_requests': hourly_requests,
+        }
+
+    return result_cache.get_or_compute(('viewership', sync_live_data(), key, window), compute)
+
+
+# function to get the Demographic Data aggregates for the selected filters
+@callback_metrics.timed('aggregate')
+def get_demographic_stats(selected_sporting_events, selected_countries, selected_continents, selected_days):
+    key = filter_key(selected_sporting_events, selected_countries, selected_continents, selected_days)
+
+    def compute():
+        return {
+            'age_counts': cube_sum(('age',), *key),
+            'gender_requests': cube_sum(('gender',), *key),
+            'income_requests': cube_sum(('income_status',), *key),
+        }
+
+    return result_cache.get_or_compute(('demographic', sync_live_data(), key), compute)
+
+
+# function to build the patch of the choropleth map; countries without visits are left blank,
+# as when they were missing from the figure
+@callback_metrics.timed('figure')
+def build_country_patch(country_requests):
+    patched_fig = Patch()
+    patched_fig['data'][0]['z'] = [int(count) if count else None for count in country_requests['count']]
+    patched_fig['layout']['coloraxis']['cmax'] = int(country_requests['count'].max())
+    return patched_fig
+
+
+# function to build the patch of a pie chart from the counts of each of its labels
+@callback_metrics.timed('figure')
+def build_pie_patch(counts):
+    patched_fig = Patch()
+    patched_fig['data'][0]['values'] = [int(count) for count in counts]
+    return patched_fig
+
+
+# function to build the hourly viewership figure
+@callback_metrics.timed('figure')
+def build_hourly_figure(hourly_requests, label='Visits', peaks=None):
+    fig = px.line(hourly_requests, x='time', y='count', labels={'count': label, 'time': 'Time'})
+    if peaks is not None:
+        for rank, peak in enumerate(peaks.itertuples(), 1):
+            fig.add_vrect(x0=peak.start, x1=peak.end, fillcolor="red", opacity=0.25, line_width=0,
+                          annotation_text=f"#{rank}", annotation_position="top left")
+    return fig
+
+
+# function to build the viewership by age figure
+@callback_metrics.timed('figure')
+def build_age_figure(age_requests):
+    fig = px.bar(age_requests, x='age_group', y='count', labels={'count': 'Visits', 'age_group': 'Age Group'})
+    fig.update_layout(xaxis_type='category')
+    return fig
+
+
+# function to build a heavy hitter bar chart: each bar reaches the guaranteed count of its value and its
+# error bar the most that count can fall short by
+@callback_metrics.timed('figure')
+def build_heavy_hitters_figure(top, error, label):
+    fig = px.bar(top, x='count', y='value', orientation='h', error_x='error', error_x_minus=[0] * len(top),
+                 labels={'count': 'Requests', 'value': label})
+    fig.update_layout(yaxis_type='category', yaxis_categoryorder='total ascending')
+    if top.empty:
+        fig.add_annotation(text=f"No value with more than {error} requests", showarrow=False,
+                           xref='paper', yref='paper', x=0.5, y=0.5)
+    return fig
+
+
+# function to build the hourly requests of a network range, stacked by status code
+@callback_metrics.timed('figure')
+def build_ip_range_figure(hourly):
+    fig = px.bar(hourly, x='time', y='count', color='status_code',
+                 labels={'count': 'Requests', 'time': 'Time', 'status_code': 'Status'})
+    return fig
+
+
+# function to build the concurrent sporting events heatmap; binned on the server, the figure holds one
+# cell per event and bin, placed on the time axis by its start and step instead of an array of timestamps
+@callback_metrics.timed('figure')
+def build_concurrent_figure(events, visits, start, resolution):
+    time_format = "%b %d %H:%M" if visits.shape[1] > MINUTES_PER_DAY // resolution else "%H:%M"
+    fig = go.Figure(go.Heatmap(z=visits, y=events, x0=start, dx=resolution * 60 * 1000,
+                               colorscale="balance", colorbar_title="Visits",
+                               hovertemplate=f"%{{y}}<br>%{{x|{time_format}}}<br>Visits: %{{z}}<extra></extra>"))
+    fig.update_layout(xaxis_title="Time",
+                      yaxis_title="Sporting Event")
+    fig.update_layout(xaxis_type="date", xaxis_nticks=24)
+    return fig
+
+
+# index of the countries and continents of the log, for the dropdown options
+dimension_index = DimensionIndex(cube.locations.itertuples(index=False, name=None))
+
 # get unique continents and countries
-continents = sorted(data['continent'].unique())
-countries = sorted(data['country'].unique())
+continents = dimension_index.continents
+countries = dimension_index.countries
+
+# first and last day of the log, the range the date pickers offer
+first_date = date_of_day(cube.days[0]).date()
+last_date = date_of_day(cube.days[-1]).date()
+
+
+# function to build dropdown options labelled with their visit counts
+def build_options(values, counts):
+    return [{'label': f"{value} ({counts.get(value, 0):,})", 'value': value} for value in values]
+
+
+# function to get the sporting event dropdown options, counted under the selected countries, continents and days
+def get_sporting_event_options(selected_countries, selected_continents, selected_days):
+    counts = cube_sum(('sporting_event',), None, selected_countries, selected_continents, selected_days)
+    return build_options(path_requests['sporting_event'], dict(zip(cube.sporting_events, counts.tolist())))
+
+
+# function to get the country dropdown options of the selected continents, counted under the selected
+# sporting events, continents and days
+def get_country_options(selected_sporting_events, selected_continents, selected_days):
+    counts = cube_sum(('location',), selected_sporting_events, None, selected_continents, selected_days)
+    return build_options(dimension_index.countries_in(selected_continents), dimension_index.country_counts(counts))
+
+
+# function to get the continent dropdown options of the selected countries, counted under the selected
+# sporting events, countries and days
+def get_continent_options(selected_sporting_events, selected_countries, selected_days):
+    counts = cube_sum(('location',), selected_sporting_events, selected_countries, None, selected_days)
+    return build_options(dimension_index.continents_of_countries(selected_countries),
+                         dimension_index.continent_counts(counts))
+
+
+# base figures of the charts whose layout does not depend on the filters: they are built once with every
+# country or category and no visits, and the callbacks send dash.Patch updates of their data arrays only
+base_country_figure = px.choropleth(get_country_requests(None, None, None, None).assign(count=0), locations='country',
+                                    locationmode='country names', color='count', color_continuous_scale='Viridis',
+                                    range_color=(0, 1), labels={'count': 'Visits'})
+base_country_figure.update_layout(geo=dict(showcoastlines=True))
+
+base_unique_country_figure = go.Figure(base_country_figure)
+base_unique_country_figure.update_layout(coloraxis_colorbar_title_text='Unique Viewers')
+
+base_gender_figure = px.pie(pd.DataFrame({'gender': cube.genders, 'count': 0}), values='count', names='gender',
+                            hole=0.3)
+
+base_income_figure = px.pie(pd.DataFrame({'income_status': cube.income_statuses, 'count': 0}), values='count',
+                            names='income_status', hole=0.3)
+
+base_sporting_event_figure = px.pie(pd.DataFrame({'Sporting Event': cube.sporting_events[:-1], 'Requests': 0}),
+                                    values='Requests', names='Sporting Event')
+
+base_hourly_figure = build_hourly_figure(pd.DataFrame({'time': pd.to_datetime([]), 'count': 0}))
+
+base_hourly_unique_figure = build_hourly_figure(pd.DataFrame({'time': pd.to_datetime([]), 'count': 0}), 'Unique Viewers')
+
+base_age_figure = build_age_figure(pd.DataFrame({'age_group': [], 'count': 0}))
+
+empty_ip_range = pd.DataFrame({'time': pd.to_datetime([]), 'status_code': [], 'count': []})
+
+
+# function to encode a counts array as base64 in the smallest unsigned integer type holding its counts
+def encode_counts(counts):
+    dtype = next(dtype for dtype in (np.uint8, np.uint16, np.uint32) if counts.max(initial=0) <= np.iinfo(dtype).max)
+    return {
+        'dtype': np.dtype(dtype).name,
+        'shape': list(counts.shape),
+        'data': base64.b64encode(counts.astype(np.dtype(dtype).newbyteorder('<')).tobytes()).decode('ascii'),
+    }
+
+
+# function to get the count cube and its labels as compact arrays, for the client-side callbacks
+def get_cube_data():
+    def compute():
+        with live_lock:
+            return {
+                'days': cube.days.tolist(),
+                'sporting_events': cube.sporting_events,
+                'no_sporting_event': cube.sporting_events[-1],
+                'option_events': path_requests['sporting_event'].tolist(),
+                'countries': dimension_index.countries,
+                'continents': dimension_index.continents,
+                'location_countries': dimension_index.location_countries.tolist(),
+                'location_continents': dimension_index.location_continents.tolist(),
+                'labels': {axis: list(map(str, cube.labels[axis])) for axis in COUNT_AXES if axis != 'hour'},
+                'default_age_edges': DEFAULT_AGE_EDGES,
+                'counts': {axis: encode_counts(cube.counts[axis]) for axis in COUNT_AXES if axis != 'hour'},
+            }
+
+    return result_cache.get_or_compute(('cube', sync_live_data()), compute)
 
 
 app = Dash(__name__, external_stylesheets=[dbc.themes.PULSE])
 server = app.server
 
+# Prometheus metrics of the callbacks; each callback's record is finished once its response is serialized
+server.after_request(callback_metrics.after_request)
+server.add_url_rule('/metrics', 'metrics', callback_metrics.metrics_view)
+
+
+# function to get the visit counts of the selected filters grouped by the given dimensions (see
+# AGGREGATE_DIMENSIONS in api.py), as a frame with a column per dimension, in order, and a count column;
+# groups without visits are left out
+@callback_metrics.timed('aggregate')
+def get_aggregate(group_by, selected_sporting_events, selected_countries, selected_continents, selected_days):
+    by_location = 'country' in group_by or 'continent' in group_by
+    keep = ([axis for axis in ('day', 'sporting_event') if axis in group_by] + ['location'] * by_location
+            + [axis for axis in COUNT_AXES if axis in group_by])
+    sync_live_data()
+    with live_lock:
+        counts = cube.sum(tuple(keep), selected_sporting_events, selected_countries, selected_continents,
+                          selected_days)
+        labels = {
+            'day': [date_of_day(day).strftime('%Y-%m-%d') for day in cube.days_in(selected_days)],
+            'sporting_event': cube.sporting_events,
+            'location': np.arange(len(cube.locations)),
+        }
+        labels.update(cube.labels)
+    if not keep:
+        return pd.DataFrame({'count': [int(counts)]})
+
+    aggregate = pd.DataFrame({'count': counts.reshape(-1)},
+                             index=pd.MultiIndex.from_product([labels[axis] for axis in keep], names=keep)).reset_index()
+    if by_location:
+        aggregate['country'] = cube.locations['country'].to_numpy()[aggregate['location']]
+        aggregate['continent'] = cube.locations['continent'].to_numpy()[aggregate['location']]
+    aggregate = aggregate.groupby(group_by, sort=False)['count'].sum().reset_index()
+    return aggregate[aggregate['count'] > 0].reset_index(drop=True)
+
+
+# Flask view of the aggregate API, e.g. /api/aggregate?group_by=day,country&sporting_event=Tennis: the visit
+# counts of the dashboard filters (sporting_event, country, continent, start_date and end_date) grouped by
+# the group_by dimensions, as JSON records or an Arrow IPC stream (format=arrow, or an Accept header asking
+# for it). Responses carry an entity tag of the data version and the query, so polling an unchanged query
+# gets a 304 without computing it, and a computed body is kept in the result cache for the other workers
+def aggregate_view():
+    try:
+        group_by = parse_group_by(request.args.getlist('group_by'))
+        format_name = response_format(request.args.get('format'), request.accept_mimetypes)
+        key = filter_key(parse_list(request.args.getlist('sporting_event')),
+                         parse_list(request.args.getlist('country')),
+                         parse_list(request.args.getlist('continent')),
+                         day_range(request.args.get('start_date'), request.args.get('end_date')))
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+
+    version = sync_live_data()
+    etag = entity_tag(version, key, group_by, format_name)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        body, mimetype = result_cache.get_or_compute(
+            ('api', version, key, tuple(group_by), format_name),
+            lambda: encode_frame(get_aggregate(group_by, *key), format_name))
+        response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept')
+    return response
+
+
+server.add_url_rule('/api/aggregate', 'aggregate', aggregate_view)
+
+# client-side mode: the count cube is sent to the browser once per page load (and again when live rows
+# arrive), and the dropdowns and the Demographic Data charts are updated by JavaScript callbacks
+# (assets/clientside.js) slicing it, without a request per interaction; the Viewership Statistics tab, whose
+# time of day window is answered from the minute counts, stays on the server
+clientside_callbacks = os.environ.get("FUN_OLYMPICS_CLIENTSIDE_CALLBACKS") == "1"
+
+# consolidated mode: one multi-output callback per tab computes the filtered aggregates once and
+# returns every KPI and figure of the tab in a single response, instead of one request per output
+consolidated_callbacks = os.environ.get("FUN_OLYMPICS_CONSOLIDATED_CALLBACKS") == "1" and not clientside_callbacks
+
+# background mode: the callbacks of the expensive figures (the concurrent sporting events heatmap and the
+# choropleth map) run as Dash background callbacks, each call in a job process of its own whose result is
+# polled through a disk cache shared by the gunicorn workers, so a slow figure holds no worker; a new
+# request of the same callback from the same page terminates the job of the request it supersedes,
+# so a burst of filter changes only computes the latest filters
+background_callbacks = os.environ.get("FUN_OLYMPICS_BACKGROUND_CALLBACKS") == "1"
+background_interval = int(os.environ.get("FUN_OLYMPICS_BACKGROUND_INTERVAL", 250))
+background_manager = None
+if background_callbacks:
+    # optional dependencies of the background mode: pip install "dash[diskcache]"
+    import diskcache
+    from dash import DiskcacheManager
+
+    background_manager = DiskcacheManager(diskcache.Cache(private_directory(os.environ.get(
+        "FUN_OLYMPICS_BACKGROUND_CACHE", os.path.join(cache_path(data_path), "background")))))
+
+
+# function to register an instrumented callback
+def instrumented_callback(*args, **kwargs):
+    return lambda func: app.callback(*args, **kwargs)(callback_metrics.instrument(func))
+
+
+# function to register a dropdown options callback, unless the client-side callbacks are used
+def options_callback(*args, **kwargs):
+    if clientside_callbacks:
+        return lambda func: func
+    return instrumented_callback(*args, **kwargs)
+
+
+# function to register a single-output callback, unless the consolidated callbacks are used, or the
+# client-side callbacks when the output is updated in the browser
+def output_callback(*args, in_browser=True, background_progress=None, **kwargs):
+    if consolidated_callbacks or (clientside_callbacks and in_browser):
+        return lambda func: func
+    if background_progress is not None:
+        return background_callback(background_progress, *args, **kwargs)
+    return instrumented_callback(*args, **kwargs)
+
+
+# function to register an instrumented callback of expensive figures, as a background callback in the
+# background mode: it runs in a job process of its own while its progress is shown by the given progress
+# bar, which is visible only while the job runs
+def background_callback(progress_bar, *args, **kwargs):
+    if not background_callbacks:
+        return instrumented_callback(*args, **kwargs)
+
+    def register(func):
+        instrumented = callback_metrics.instrument(func)
+
+        # the progress reporter of the job is passed as the first argument
+        @functools.wraps(func)
+        def job(set_progress, *arguments):
+            job_progress['report'] = set_progress
+            return instrumented(*arguments)
+
+        app.callback(*args, background=True, manager=background_manager, interval=background_interval,
+                     running=[(Output(progress_bar, 'style'), {}, {'display': 'none'})],
+                     progress=[Output(progress_bar, 'value'), Output(progress_bar, 'label')],
+                     progress_default=[0, ""], **kwargs)(job)
+        return instrumented
+    return register
+
 # define dashboard layout
 app.layout = html.Div([
     html.H1("Payris 2024 FunOlympic Games Dashboard", style={'text-align': 'center', 'margin-bottom': '20px', 'margin-top': '20px',
                                                              'font-weight': 'bold'}),
+    dcc.Interval(id='live-interval', interval=live_interval, disabled=not live_mode),
+    dcc.Store(id='live-rows', data=0),
+    dcc.Store(id='cube-data'),
     html.Div(className="container", children=[
         dcc.Tabs([
             dcc.Tab(label='Demographic Data', children=[
@@ -94,7 +888,7 @@ app.layout = html.Div([
                                                     multi=True,
                                                 ),
                                             ],
-                                            width=4
+                                            width=3
                                         ),
 
                                         dbc.Col(
@@ -107,7 +901,7 @@ app.layout = html.Div([
                                                     multi=True,
                                                 ),
                                             ],
-                                            width=4
+                                            width=3
                                         ),
 
                                         dbc.Col(
@@ -119,7 +913,21 @@ app.layout = html.Div([
                                                     multi=True,
                                                 ),
                                             ],
-                                            width=4
+                                            width=3
+                                        ),
+
+                                        dbc.Col(
+                                            [
+                                                html.Label("Select Dates"),
+                                                dcc.DatePickerRange(
+                                                    id='date-range',
+                                                    min_date_allowed=first_date,
+                                                    max_date_allowed=last_date,
+                                                    initial_visible_month=first_date,
+                                                    clearable=True,
+                                                ),
+                                            ],
+                                            width=3
                                         ),
                                     ])
                                 ])
@@ -132,7 +940,9 @@ app.layout = html.Div([
                             dbc.Card([
                                 dbc.CardHeader(html.H5("Viewership by Country")),
                                 dbc.CardBody([
-                                    dcc.Graph(id='country-requests'),
+                                    dbc.Progress(id='country-progress', value=0, striped=True, animated=True,
+                                                 style={'display': 'none'}),
+                                    dcc.Graph(id='country-requests', figure=base_country_figure),
                                 ])
                             ], className="mb-3"),
                             width=7
@@ -141,17 +951,36 @@ app.layout = html.Div([
                             dbc.Card([
                                 dbc.CardHeader(html.H5("Average Viewership by Income Status")),
                                 dbc.CardBody([
-                                    dcc.Graph(id='income-requests'),
+                                    dcc.Graph(id='income-requests', figure=base_income_figure),
                                 ])
                             ], className="mb-3"),
                             width=5
                         )]),
+                    dbc.Row([
+                        dbc.Col(
+                            dbc.Card([
+                                dbc.CardHeader(html.H5("Unique Viewers by Country")),
+                                dbc.CardBody([
+                                    dcc.Graph(id='country-unique-viewers', figure=base_unique_country_figure),
+                                ])
+                            ], className="mb-3"),
+                            width=12
+                        ),
+                    ]),
                     dbc.Row([
                         dbc.Col(
                             dbc.Card([
                                 dbc.CardHeader(html.H5("Average Viewership by Age Group")),
                                 dbc.CardBody([
-                                    dcc.Graph(id='age-requests'),
+                                    dcc.Graph(id='age-requests', figure=base_age_figure),
+                                    dcc.RangeSlider(id='age-range', min=int(cube.ages[0]), max=int(cube.ages[-1]), step=1,
+                                                    value=[int(cube.ages[0]), int(cube.ages[-1])],
+                                                    marks={int(age): str(age) for age in cube.ages if age % 10 == 0},
+                                                    tooltip={'placement': 'bottom'}),
+                                    dbc.Input(id='age-edges', type='text', debounce=True,
+                                              value=", ".join(map(str, DEFAULT_AGE_EDGES)),
+                                              placeholder="Upper edges of the age bins, e.g. 24, 34, 44",
+                                              className="mt-2"),
                                 ])
                             ], className="mb-3"),
                             width=6
@@ -160,7 +989,7 @@ app.layout = html.Div([
                             dbc.Card([
                                 dbc.CardHeader(html.H5("Average Viewership by Gender")),
                                 dbc.CardBody([
-                                    dcc.Graph(id='gender-requests'),
+                                    dcc.Graph(id='gender-requests', figure=base_gender_figure),
                                 ])
                             ], className="mb-3"),
                             width=6
@@ -186,7 +1015,7 @@ app.layout = html.Div([
                                                     multi=True,
                                                 ),
                                             ],
-                                            width=4
+                                            width=3
                                         ),
 
                                         dbc.Col(
@@ -199,7 +1028,7 @@ app.layout = html.Div([
                                                     multi=True,
                                                 ),
                                             ],
-                                            width=4
+                                            width=3
                                         ),
 
                                         dbc.Col(
@@ -211,9 +1040,41 @@ app.layout = html.Div([
                                                     multi=True,
                                                 ),
                                             ],
-                                            width=4
+                                            width=3
                                         ),
-                                    ])
+
+                                        dbc.Col(
+                                            [
+                                                html.Label("Select Dates"),
+                                                dcc.DatePickerRange(
+                                                    id='date-range-home',
+                                                    min_date_allowed=first_date,
+                                                    max_date_allowed=last_date,
+                                                    initial_visible_month=first_date,
+                                                    clearable=True,
+                                                ),
+                                            ],
+                                            width=3
+                                        ),
+                                    ]),
+                                    dbc.Row([
+                                        dbc.Col(
+                                            [
+                                                html.Label("Select Time of Day"),
+                                                dcc.RangeSlider(
+                                                    id='time-range',
+                                                    min=0,
+                                                    max=MINUTES_PER_DAY,
+                                                    step=1,
+                                                    value=[0, MINUTES_PER_DAY],
+                                                    marks={minute: f"{minute // 60:02d}:00"
+                                                           for minute in range(0, MINUTES_PER_DAY + 1, 180)},
+                                                    tooltip={'placement': 'bottom', 'transform': 'formatMinutes'},
+                                                ),
+                                            ],
+                                            width=12
+                                        ),
+                                    ], className="mt-3"),
                                 ])
                             ], className="mb-3"),
                             width=12
@@ -228,16 +1089,33 @@ app.layout = html.Div([
                                     html.H2(id='total-requests-value', children="Placeholder"),
                                 ])
                             ], className="mb-3", style={'background-color': '#f8d7da', 'color': '#721c24', 'border-color': '#f5c6cb'}),
-                            width=4
+                            width=3
+                        ),
+                        dbc.Col(
+                            dbc.Card([
+                                dbc.CardHeader(html.H5("Unique Viewers (Estimated)")),
+                                dbc.CardBody([
+                                    html.H2(id='unique-viewers-value', children="Placeholder"),
+                                ])
+                            ], className="mb-3", style={'background-color': '#f8d7da', 'color': '#721c24', 'border-color': '#f5c6cb'}),
+                            width=3
                         ),
                         dbc.Col(
                             dbc.Card([
                                 dbc.CardHeader(html.H5("Peak Viewing Time")),
                                 dbc.CardBody([
                                     html.H2(id='peak-viewing-time', children="Placeholder"),
+                                    html.Div(id='peak-windows'),
+                                    dcc.RadioItems(
+                                        id='peak-window',
+                                        options=[{'label': f"{width} min", 'value': width} for width in [1, 5, 15, 60]],
+                                        value=60,
+                                        inline=True,
+                                        inputStyle={'margin-right': '5px', 'margin-left': '10px'},
+                                    ),
                                 ])
                             ], className="mb-3", style={'background-color': '#f8d7da', 'color': '#721c24', 'border-color': '#f5c6cb'}),
-                            width=4
+                            width=3
                         ),
                         dbc.Col(
                             dbc.Card([
@@ -246,7 +1124,7 @@ app.layout = html.Div([
                                     html.H2(id='most-popular-sporting-event', children="Placeholder"),
                                 ])
                             ], className="mb-3", style={'background-color': '#f8d7da', 'color': '#721c24', 'border-color': '#f5c6cb'}),
-                            width=4
+                            width=3
                         ),
                     ]),
 
@@ -255,7 +1133,7 @@ app.layout = html.Div([
                             dbc.Card([
                                 dbc.CardHeader(html.H5("Average Viewership at Each Time of Day")),
                                 dbc.CardBody([
-                                    dcc.Graph(id='hourly-requests'),
+                                    dcc.Graph(id='hourly-requests', figure=base_hourly_figure),
                                 ])
                             ], className="mb-3"),
                             width=7
@@ -264,17 +1142,37 @@ app.layout = html.Div([
                             dbc.Card([
                                 dbc.CardHeader(html.H5("Number of Visits per Sporting Event")),
                                 dbc.CardBody([
-                                    dcc.Graph(id='sporting-event-requests'),
+                                    dcc.Graph(id='sporting-event-requests', figure=base_sporting_event_figure),
                                 ])
                             ], className="mb-3"),
                             width=5
                         )
                     ]),
+                    dbc.Row([
+                        dbc.Col(
+                            dbc.Card([
+                                dbc.CardHeader(html.H5("Unique Viewers at Each Time of Day")),
+                                dbc.CardBody([
+                                    dcc.Graph(id='hourly-unique-viewers', figure=base_hourly_unique_figure),
+                                ])
+                            ], className="mb-3"),
+                            width=12
+                        ),
+                    ]),
                     dbc.Row([
                         dbc.Col(
                             dbc.Card([
                                 dbc.CardHeader(html.H5("Viewership of Concurrently Running Sporting Events")),
                                 dbc.CardBody([
+                                    dcc.RadioItems(
+                                        id='heatmap-resolution',
+                                        options=[{'label': f"{minutes} min", 'value': minutes} for minutes in [1, 5, 15, 60]],
+                                        value=15,
+                                        inline=True,
+                                        inputStyle={'margin-right': '5px', 'margin-left': '15px'},
+                                    ),
+                                    dbc.Progress(id='concurrent-progress', value=0, striped=True, animated=True,
+                                                 style={'display': 'none'}),
                                     dcc.Graph(id='concurrent-sporting-events'),
                                 ])
                             ], className="mb-3"),
@@ -283,282 +1181,625 @@ app.layout = html.Div([
                     ]),
                 ])
             ]),
+            dcc.Tab(label='Traffic', children=[
+                html.Div(children=[
+                    dbc.Row([
+                        dbc.Col(
+                            dbc.Card([
+                                dbc.CardHeader(html.H5("Top Entries")),
+                                dbc.CardBody([
+                                    dcc.RadioItems(
+                                        id='top-n',
+                                        options=[{'label': f"Top {n}", 'value': n} for n in [10, 25, 50]],
+                                        value=10,
+                                        inline=True,
+                                        inputStyle={'margin-right': '5px', 'margin-left': '15px'},
+                                    ),
+                                ])
+                            ], className="mb-3"),
+                            width=12
+                        ),
+                    ]),
+                    dbc.Row([
+                        dbc.Col(
+                            dbc.Card([
+                                dbc.CardHeader(html.H5("Top IP Addresses by Requests")),
+                                dbc.CardBody([
+                                    dcc.Graph(id='top-ip-addresses'),
+                                ])
+                            ], className="mb-3"),
+                            width=6
+                        ),
+                        dbc.Col(
+                            dbc.Card([
+                                dbc.CardHeader(html.H5("Top Paths by Error Status")),
+                                dbc.CardBody([
+                                    dcc.RadioItems(
+                                        id='error-status',
+                                        options=[],
+                                        value=None,
+                                        inline=True,
+                                        inputStyle={'margin-right': '5px', 'margin-left': '15px'},
+                                    ),
+                                    dcc.Graph(id='top-error-paths'),
+                                ])
+                            ], className="mb-3"),
+                            width=6
+                        ),
+                    ]),
+                    dbc.Row([
+                        dbc.Col(
+                            dbc.Card([
+                                dbc.CardHeader(html.H5("Requests from a Network Range")),
+                                dbc.CardBody([
+                                    dbc.Input(id='ip-filter', type='text', debounce=True,
+                                              placeholder="IP address or CIDR block, e.g. 192.168.0.0/16"),
+                                    html.P(id='ip-range-summary', className="mt-2"),
+                                    dcc.Graph(id='ip-range-requests'),
+                                ])
+                            ], className="mb-3"),
+                            width=12
+                        ),
+                    ]),
+                ])
+            ]),
         ])
     ])
 ])
 
+# ingest newly appended log lines in live mode; the charts refresh only when rows were added
+@instrumented_callback(
+    Output('live-rows', 'data'),
+    [Input('live-interval', 'n_intervals')],
+    [State('live-rows', 'data')],
+    prevent_initial_call=True
+)
+def update_live_rows(n_intervals, live_rows):
+    data_version = sync_live_data()
+    if data_version[1] == live_rows:
+        return no_update
+    return data_version[1]
+
+# update sporting event dropdown options based on selected countries and continents - Viewership Statistics page
+@options_callback(
+    Output('sporting-event-dropdown-home', 'options'),
+    [Input('country-dropdown-home', 'value'),
+     Input('continent-dropdown-home', 'value'),
+     Input('date-range-home', 'start_date'),
+     Input('date-range-home', 'end_date'),
+     Input('live-rows', 'data')]
+)
+def update_home_sporting_event_options(selected_countries, selected_continents, start_date, end_date, live_rows):
+    return get_sporting_event_options(selected_countries, selected_continents, day_range(start_date, end_date))
+
 # update country dropdown options based on selected continent - Viewership Statistics page
-@app.callback(
+@options_callback(
     Output('country-dropdown-home', 'options'),
-    [Input('continent-dropdown-home', 'value')]
+    [Input('sporting-event-dropdown-home', 'value'),
+     Input('continent-dropdown-home', 'value'),
+     Input('date-range-home', 'start_date'),
+     Input('date-range-home', 'end_date'),
+     Input('live-rows', 'data')]
 )
-def update_country_options(selected_continents):
-    if selected_continents:
-        filtered_data = data[data['continent'].isin(selected_continents)]
-        countries_in_selected_continents = sorted(filtered_data['country'].unique())
-        return [{'label': country, 'value': country} for country in countries_in_selected_continents]
-    else:
-        return [{'label': country, 'value': country} for country in countries]
+def update_home_country_options(selected_sporting_events, selected_continents, start_date, end_date, live_rows):
+    return get_country_options(selected_sporting_events, selected_continents, day_range(start_date, end_date))
 
 # update continent dropdown options based on selected country - Viewership Statistics page
-@app.callback(
+@options_callback(
     Output('continent-dropdown-home', 'options'),
-    [Input('country-dropdown-home', 'value')]
+    [Input('sporting-event-dropdown-home', 'value'),
+     Input('country-dropdown-home', 'value'),
+     Input('date-range-home', 'start_date'),
+     Input('date-range-home', 'end_date'),
+     Input('live-rows', 'data')]
 )
-def update_continent_options(selected_countries):
-    if selected_countries:
-        filtered_data = data[data['country'].isin(selected_countries)]
-        continents_of_selected_countries = sorted(filtered_data['continent'].unique())
-        return [{'label': continent, 'value': continent} for continent in continents_of_selected_countries]
-    else:
-        return [{'label': continent, 'value': continent} for continent in continents]
-
+def update_home_continent_options(selected_sporting_events, selected_countries, start_date, end_date, live_rows):
+    return get_continent_options(selected_sporting_events, selected_countries, day_range(start_date, end_date))
+
+
+# update sporting event dropdown options based on selected countries and continents - Demographic Data page
+@options_callback(
+    Output('sporting-event-dropdown', 'options'),
+    [Input('country-dropdown', 'value'),
+     Input('continent-dropdown', 'value'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date'),
+     Input('live-rows', 'data')]
+)
+def update_demographic_sporting_event_options(selected_countries, selected_continents, start_date, end_date,
+                                              live_rows):
+    return get_sporting_event_options(selected_countries, selected_continents, day_range(start_date, end_date))
 
 # update country dropdown options based on selected continent - Demographic Data page
-@app.callback(
+@options_callback(
     Output('country-dropdown', 'options'),
-    [Input('continent-dropdown', 'value')]
+    [Input('sporting-event-dropdown', 'value'),
+     Input('continent-dropdown', 'value'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date'),
+     Input('live-rows', 'data')]
 )
-def update_country_options(selected_continents):
-    if selected_continents:
-        filtered_data = data[data['continent'].isin(selected_continents)]
-        countries_in_selected_continents = sorted(filtered_data['country'].unique())
-        return [{'label': country, 'value': country} for country in countries_in_selected_continents]
-    else:
-        return [{'label': country, 'value': country} for country in countries]
+def update_demographic_country_options(selected_sporting_events, selected_continents, start_date, end_date,
+                                       live_rows):
+    return get_country_options(selected_sporting_events, selected_continents, day_range(start_date, end_date))
 
 # update continent dropdown options based on selected country - Demographic Data page
-@app.callback(
+@options_callback(
     Output('continent-dropdown', 'options'),
-    [Input('country-dropdown', 'value')]
+    [Input('sporting-event-dropdown', 'value'),
+     Input('country-dropdown', 'value'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date'),
+     Input('live-rows', 'data')]
 )
-def update_continent_options(selected_countries):
-    if selected_countries:
-        filtered_data = data[data['country'].isin(selected_countries)]
-        continents_of_selected_countries = sorted(filtered_data['continent'].unique())
-        return [{'label': continent, 'value': continent} for continent in continents_of_selected_countries]
-    else:
-        return [{'label': continent, 'value': continent} for continent in continents]
+def update_demographic_continent_options(selected_sporting_events, selected_countries, start_date, end_date,
+                                         live_rows):
+    return get_continent_options(selected_sporting_events, selected_countries, day_range(start_date, end_date))
 
 # callback to update the total website visits value
-@app.callback(
+@output_callback(
     Output('total-requests-value', 'children'),
     [Input('sporting-event-dropdown-home', 'value'),
      Input('country-dropdown-home', 'value'),
-     Input('continent-dropdown-home', 'value')]
+     Input('continent-dropdown-home', 'value'),
+     Input('date-range-home', 'start_date'),
+     Input('date-range-home', 'end_date'),
+     Input('time-range', 'value'),
+     Input('live-rows', 'data')],
+    in_browser=False
 )
-def update_total_requests(selected_sporting_events, selected_countries, selected_continents):
-    filtered_data = data.copy()
-
-    if selected_sporting_events:
-        filtered_data = filtered_data[filtered_data['sporting_event'].isin(selected_sporting_events)]
-    if selected_countries:
-        filtered_data = filtered_data[filtered_data['country'].isin(selected_countries)]
-    if selected_continents:
-        filtered_data = filtered_data[filtered_data['continent'].isin(selected_continents)]
-
-    total_requests = len(filtered_data)
-    return total_requests
+def update_total_requests(selected_sporting_events, selected_countries, selected_continents, start_date, end_date,
+                          time_range, live_rows):
+    stats = get_viewership_stats(selected_sporting_events, selected_countries, selected_continents,
+                                 day_range(start_date, end_date), time_window(time_range))
+    return stats['total_requests']
 
 # callback for updating the choropleth map based on selected sporting events
-@app.callback(
+@output_callback(
     Output('country-requests', 'figure'),
-    [Input('sporting-event-dropdown', 'value')]
+    [Input('sporting-event-dropdown', 'value'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date'),
+     Input('live-rows', 'data')],
+    background_progress='country-progress'
 )
-def update_country_requests(selected_sporting_events):
-    filtered_data = data.copy()
-
-    if selected_sporting_events:
-        filtered_data = filtered_data[filtered_data['sporting_event'].isin(selected_sporting_events)]
-
-    country_requests = filtered_data.groupby('country').size().reset_index(name='count')
-
-    fig = px.choropleth(country_requests, locations='country', locationmode='country names', color='count',
-                        color_continuous_scale='Viridis', range_color=(0, max(country_requests['count'])),
-                        labels={'count': 'Visits'})
-    fig.update_layout(geo=dict(showcoastlines=True))
-    return fig
+def update_country_requests(selected_sporting_events, start_date, end_date, live_rows):
+    report_progress(0, "Counting the visits per country")
+    country_requests = get_country_requests(selected_sporting_events, None, None, day_range(start_date, end_date))
+    report_progress(1 / 2, "Building the figure")
+    return build_country_patch(country_requests)
 
 # callback for updating viewership time graph
-@app.callback(
+@output_callback(
     Output('hourly-requests', 'figure'),
     [Input('sporting-event-dropdown-home', 'value'),
      Input('country-dropdown-home', 'value'),
-     Input('continent-dropdown-home', 'value')]
+     Input('continent-dropdown-home', 'value'),
+     Input('date-range-home', 'start_date'),
+     Input('date-range-home', 'end_date'),
+     Input('time-range', 'value'),
+     Input('peak-window', 'value'),
+     Input('live-rows', 'data')],
+    in_browser=False
 )
-def update_hourly_requests(selected_sporting_events, selected_countries, selected_continents):
-    filtered_data = data.copy()
-
-    if selected_sporting_events:
-        filtered_data = filtered_data[filtered_data['sporting_event'].isin(selected_sporting_events)]
-    if selected_countries:
-        filtered_data = filtered_data[filtered_data['country'].isin(selected_countries)]
-    if selected_continents:
-        filtered_data = filtered_data[filtered_data['continent'].isin(selected_continents)]
-
-    hourly_requests = filtered_data.groupby(pd.Grouper(key='time', freq='h')).size().reset_index(name='count')
-
-    fig = px.line(hourly_requests, x='time', y='count', labels={'count': 'Visits', 'time': 'Time'})
-    return fig
+def update_hourly_requests(selected_sporting_events, selected_countries, selected_continents, start_date, end_date,
+                           time_range, peak_width, live_rows):
+    selected_days = day_range(start_date, end_date)
+    hourly_requests = get_viewership_stats(selected_sporting_events, selected_countries, selected_continents,
+                                           selected_days, time_window(time_range))['hourly_requests']
+    peaks = get_peak_windows(selected_sporting_events, selected_countries, selected_continents, selected_days,
+                             time_window(time_range), peak_width)
+    return build_hourly_figure(hourly_requests, peaks=peaks['peaks'])
 
 
 # callback for updating viewership by age graph
-@app.callback(
+@output_callback(
     Output('age-requests', 'figure'),
     [Input('sporting-event-dropdown', 'value'),
      Input('country-dropdown', 'value'),
-     Input('continent-dropdown', 'value')]
+     Input('continent-dropdown', 'value'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date'),
+     Input('age-range', 'value'),
+     Input('age-edges', 'value'),
+     Input('live-rows', 'data')]
 )
-def update_age_requests(selected_sporting_events, selected_countries, selected_continents):
-    filtered_data = data.copy()
-
-    if selected_sporting_events:
-        filtered_data = filtered_data[filtered_data['sporting_event'].isin(selected_sporting_events)]
-    if selected_countries:
-        filtered_data = filtered_data[filtered_data['country'].isin(selected_countries)]
-    if selected_continents:
-        filtered_data = filtered_data[filtered_data['continent'].isin(selected_continents)]
+def update_age_requests(selected_sporting_events, selected_countries, selected_continents, start_date, end_date,
+                        age_range, age_edges, live_rows):
+    age_counts = get_demographic_stats(selected_sporting_events, selected_countries, selected_continents,
+                                       day_range(start_date, end_date))['age_counts']
+    return build_age_figure(get_age_requests(age_counts, age_range, age_edges))
 
-    age_requests = filtered_data.groupby('age_group', observed=True).size().reset_index(name='count')
 
-    fig = px.bar(age_requests, x='age_group', y='count', labels={'count': 'Visits', 'age_group': 'Age Group'})
-    return fig
+# callback for flagging malformed age bin edges
+@instrumented_callback(
+    Output('age-edges', 'invalid'),
+    [Input('age-edges', 'value')]
+)
+def update_age_edges_validity(age_edges):
+    return parse_age_edges(age_edges) is None
 
 
 # callback for updating viewership by gender graph
-@app.callback(
+@output_callback(
     Output('gender-requests', 'figure'),
     [Input('sporting-event-dropdown', 'value'),
      Input('country-dropdown', 'value'),
-     Input('continent-dropdown', 'value')]
+     Input('continent-dropdown', 'value'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date'),
+     Input('live-rows', 'data')]
 )
-def update_gender_requests(selected_sporting_events, selected_countries, selected_continents):
-    filtered_data = data.copy()
-
-    if selected_sporting_events:
-        filtered_data = filtered_data[filtered_data['sporting_event'].isin(selected_sporting_events)]
-    if selected_countries:
-        filtered_data = filtered_data[filtered_data['country'].isin(selected_countries)]
-    if selected_continents:
-        filtered_data = filtered_data[filtered_data['continent'].isin(selected_continents)]
-
-    gender_requests = filtered_data.groupby('gender', observed=True).size().reset_index(name='count')
-
-    fig = px.pie(gender_requests, values='count', names='gender', hole=0.3)
-    return fig
+def update_gender_requests(selected_sporting_events, selected_countries, selected_continents, start_date, end_date,
+                           live_rows):
+    gender_requests = get_demographic_stats(selected_sporting_events, selected_countries, selected_continents,
+                                            day_range(start_date, end_date))['gender_requests']
+    return build_pie_patch(gender_requests)
 
 
 # callback for updating viewership by income status graph
-@app.callback(
+@output_callback(
     Output('income-requests', 'figure'),
     [Input('sporting-event-dropdown', 'value'),
     Input('country-dropdown', 'value'),
-    Input('continent-dropdown', 'value')]
+    Input('continent-dropdown', 'value'),
+    Input('date-range', 'start_date'),
+    Input('date-range', 'end_date'),
+    Input('live-rows', 'data')]
 )
-def update_income_requests(selected_sporting_events, selected_countries, selected_continents):
-    filtered_data = data.copy()
-
-    if selected_sporting_events:
-        filtered_data = filtered_data[filtered_data['sporting_event'].isin(selected_sporting_events)]
-    if selected_countries:
-        filtered_data = filtered_data[filtered_data['country'].isin(selected_countries)]
-    if selected_continents:
-        filtered_data = filtered_data[filtered_data['continent'].isin(selected_continents)]
-
-    income_requests = filtered_data.groupby('income_status', observed=True).size().reset_index(name='count')
-
-    fig = px.pie(income_requests, values='count', names='income_status', hole=0.3)
-    return fig
+def update_income_requests(selected_sporting_events, selected_countries, selected_continents, start_date, end_date,
+                           live_rows):
+    income_requests = get_demographic_stats(selected_sporting_events, selected_countries, selected_continents,
+                                            day_range(start_date, end_date))['income_requests']
+    return build_pie_patch(income_requests)
 
 
 # callback for updating the pie chart based on selected sporting events
-@app.callback(
+@output_callback(
     Output('sporting-event-requests', 'figure'),
     [Input('country-dropdown-home', 'value'),
-     Input('continent-dropdown-home', 'value')]
+     Input('continent-dropdown-home', 'value'),
+     Input('date-range-home', 'start_date'),
+     Input('date-range-home', 'end_date'),
+     Input('time-range', 'value'),
+     Input('live-rows', 'data')],
+    in_browser=False
 )
-def update_sporting_event_requests(selected_countries, selected_continents):
-    filtered_data = data.copy()
-
-    if selected_countries:
-        filtered_data = filtered_data[filtered_data['country'].isin(selected_countries)]
-    if selected_continents:
-        filtered_data = filtered_data[filtered_data['continent'].isin(selected_continents)]
-
-    sporting_event_requests = filtered_data['sporting_event'].value_counts().reset_index()
-    sporting_event_requests.columns = ['Sporting Event', 'Requests']
-
-    fig = px.pie(sporting_event_requests, values='Requests', names='Sporting Event')
-    return fig
+def update_sporting_event_requests(selected_countries, selected_continents, start_date, end_date, time_range,
+                                   live_rows):
+    sporting_event_requests = get_sporting_event_requests(None, selected_countries, selected_continents,
+                                                          day_range(start_date, end_date), time_window(time_range))
+    return build_pie_patch(sporting_event_requests.set_index('sporting_event')['count']
+                           .reindex(cube.sporting_events[:-1], fill_value=0))
 
 
 # callback for updating the heatmap based on selected sporting events
-@app.callback(
+@output_callback(
     Output('concurrent-sporting-events', 'figure'),
     [Input('sporting-event-dropdown-home', 'value'),
      Input('country-dropdown-home', 'value'),
-     Input('continent-dropdown-home', 'value')]
+     Input('continent-dropdown-home', 'value'),
+     Input('heatmap-resolution', 'value'),
+     Input('date-range-home', 'start_date'),
+     Input('date-range-home', 'end_date'),
+     Input('time-range', 'value'),
+     Input('live-rows', 'data')],
+    in_browser=False,
+    background_progress='concurrent-progress'
 )
-def update_concurrent_sporting_events(selected_sporting_events, selected_countries, selected_continents):
-    filtered_data = data.copy()
-
-    if selected_sporting_events:
-        filtered_data = filtered_data[filtered_data['sporting_event'].isin(selected_sporting_events)]
-    if selected_countries:
-        filtered_data = filtered_data[filtered_data['country'].isin(selected_countries)]
-    if selected_continents:
-        filtered_data = filtered_data[filtered_data['continent'].isin(selected_continents)]
-
-    concurrent_sporting_events = filtered_data.groupby(['time', 'sporting_event']).size().reset_index(name='visits')
-
-    fig = px.density_heatmap(concurrent_sporting_events, x="time", y="sporting_event", z="visits",
-                             color_continuous_scale="balance")
-    fig.update_layout(xaxis_title="Time",  
-                      yaxis_title="Sporting Event", 
-                      coloraxis_colorbar_title="Visits") 
-    fig.update_layout(xaxis_nticks=24)  
-    return fig
+def update_concurrent_sporting_events(selected_sporting_events, selected_countries, selected_continents, resolution,
+                                      start_date, end_date, time_range, live_rows):
+    report_progress(0, "Binning the visits per sporting event")
+    events, visits, start = get_concurrent_sporting_events(resolution, selected_sporting_events, selected_countries,
+                                                           selected_continents, day_range(start_date, end_date),
+                                                           time_window(time_range))
+    report_progress(1 / 2, "Building the figure")
+    return build_concurrent_figure(events, visits, start, resolution)
+
+
+# callback for updating the peak viewing time value and the list of peak windows
+@output_callback(
+    [Output('peak-viewing-time', 'children'),
+     Output('peak-windows', 'children')],
+    [Input('sporting-event-dropdown-home', 'value'),
+     Input('country-dropdown-home', 'value'),
+     Input('continent-dropdown-home', 'value'),
+     Input('date-range-home', 'start_date'),
+     Input('date-range-home', 'end_date'),
+     Input('time-range', 'value'),
+     Input('peak-window', 'value'),
+     Input('live-rows', 'data')],
+    in_browser=False
+)
+def update_peak_viewing_time(selected_sporting_events, selected_countries, selected_continents, start_date, end_date,
+                             time_range, peak_width, live_rows):
+    peaks = get_peak_windows(selected_sporting_events, selected_countries, selected_continents,
+                             day_range(start_date, end_date), time_window(time_range), peak_width)
+    return format_peak_viewing_time(peaks)
+
+
+# callback for updating the most popular sporting event value
+@output_callback(
+    Output('most-popular-sporting-event', 'children'),
+    [Input('country-dropdown-home', 'value'),
+     Input('continent-dropdown-home', 'value'),
+     Input('date-range-home', 'start_date'),
+     Input('date-range-home', 'end_date'),
+     Input('time-range', 'value'),
+     Input('live-rows', 'data')],
+    in_browser=False
+)
+def update_most_popular_sporting_event(selected_countries, selected_continents, start_date, end_date, time_range,
+                                       live_rows):
+    sporting_event_requests = get_sporting_event_requests(None, selected_countries, selected_continents,
+                                                          day_range(start_date, end_date), time_window(time_range))
+
+    most_popular_event = calculate_most_popular_sporting_event(sporting_event_requests)
+    return most_popular_event
 
 
-# callback for updating the peak viewing time value
-@app.callback(
-    Output('peak-viewing-time', 'children'),
+# callback for updating the unique viewers value
+@output_callback(
+    Output('unique-viewers-value', 'children'),
     [Input('sporting-event-dropdown-home', 'value'),
      Input('country-dropdown-home', 'value'),
-     Input('continent-dropdown-home', 'value')]
+     Input('continent-dropdown-home', 'value'),
+     Input('date-range-home', 'start_date'),
+     Input('date-range-home', 'end_date'),
+     Input('time-range', 'value'),
+     Input('live-rows', 'data')],
+    in_browser=False
 )
-def update_peak_viewing_time(selected_sporting_events, selected_countries, selected_continents):
-    filtered_data = data.copy()
+def update_unique_viewers(selected_sporting_events, selected_countries, selected_continents, start_date, end_date,
+                          time_range, live_rows):
+    stats = get_unique_viewer_stats(selected_sporting_events, selected_countries, selected_continents,
+                                    day_range(start_date, end_date), time_window(time_range))
+    return stats['unique_viewers']
 
-    if selected_sporting_events:
-        filtered_data = filtered_data[filtered_data['sporting_event'].isin(selected_sporting_events)]
-    if selected_countries:
-        filtered_data = filtered_data[filtered_data['country'].isin(selected_countries)]
-    if selected_continents:
-        filtered_data = filtered_data[filtered_data['continent'].isin(selected_continents)]
 
-    hourly_requests = filtered_data.groupby(pd.Grouper(key='time', freq='h')).size().reset_index(name='count')
-
-    peak_viewing_time = calculate_peak_viewing_time(hourly_requests)
-    return peak_viewing_time.strftime('%H:%M')
+# callback for updating the unique viewers time graph
+@output_callback(
+    Output('hourly-unique-viewers', 'figure'),
+    [Input('sporting-event-dropdown-home', 'value'),
+     Input('country-dropdown-home', 'value'),
+     Input('continent-dropdown-home', 'value'),
+     Input('date-range-home', 'start_date'),
+     Input('date-range-home', 'end_date'),
+     Input('time-range', 'value'),
+     Input('live-rows', 'data')],
+    in_browser=False
+)
+def update_hourly_unique_viewers(selected_sporting_events, selected_countries, selected_continents, start_date,
+                                 end_date, time_range, live_rows):
+    stats = get_unique_viewer_stats(selected_sporting_events, selected_countries, selected_continents,
+                                    day_range(start_date, end_date), time_window(time_range))
+    return build_hourly_figure(stats['hourly_unique_viewers'], 'Unique Viewers')
 
 
-# callback for updating the most popular sporting event value
-@app.callback(
-    Output('most-popular-sporting-event', 'children'),
-    [Input('country-dropdown-home', 'value'),
-     Input('continent-dropdown-home', 'value')]
+# callback for updating the unique viewers choropleth map based on selected sporting events
+@output_callback(
+    Output('country-unique-viewers', 'figure'),
+    [Input('sporting-event-dropdown', 'value'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date'),
+     Input('live-rows', 'data')],
+    in_browser=False
 )
-def update_most_popular_sporting_event(selected_countries, selected_continents):
-    filtered_data = data.copy()
+def update_country_unique_viewers(selected_sporting_events, start_date, end_date, live_rows):
+    country_unique_viewers = get_country_unique_viewers(selected_sporting_events, None, None,
+                                                        day_range(start_date, end_date))
+    return build_country_patch(country_unique_viewers)
 
-    if selected_countries:
-        filtered_data = filtered_data[filtered_data['country'].isin(selected_countries)]
-    if selected_continents:
-        filtered_data = filtered_data[filtered_data['continent'].isin(selected_continents)]
 
-    most_popular_event = calculate_most_popular_sporting_event(filtered_data)
-    return most_popular_event
+# callback for updating the top IP addresses graph, from the heavy hitter summary
+@instrumented_callback(
+    Output('top-ip-addresses', 'figure'),
+    [Input('top-n', 'value'),
+     Input('live-rows', 'data')]
+)
+def update_top_ip_addresses(top_n, live_rows):
+    top, error = get_top_ip_addresses(top_n)
+    return build_heavy_hitters_figure(top, error, 'IP Address')
+
+
+# callback for updating the error statuses to pick from as live rows bring new ones, keeping the picked status
+# while it is still there
+@instrumented_callback(
+    [Output('error-status', 'options'),
+     Output('error-status', 'value')],
+    [Input('live-rows', 'data')],
+    [State('error-status', 'value')]
+)
+def update_error_status_options(live_rows, error_status):
+    status_codes = get_error_statuses()
+    options = [{'label': str(status_code), 'value': status_code} for status_code in status_codes]
+    if error_status in status_codes:
+        return options, no_update
+    return options, status_codes[0] if status_codes else None
+
+
+# callback for updating the top paths graph of the selected error status, from the heavy hitter summary
+@instrumented_callback(
+    Output('top-error-paths', 'figure'),
+    [Input('error-status', 'value'),
+     Input('top-n', 'value'),
+     Input('live-rows', 'data')]
+)
+def update_top_error_paths(error_status, top_n, live_rows):
+    top, error = get_top_error_paths(error_status, top_n)
+    return build_heavy_hitters_figure(top, error, 'Path')
+
+
+# callback for updating the requests of the network range in the IP filter box, answered by the sorted IP index
+@instrumented_callback(
+    [Output('ip-range-summary', 'children'),
+     Output('ip-range-requests', 'figure'),
+     Output('ip-filter', 'invalid')],
+    [Input('ip-filter', 'value'),
+     Input('live-rows', 'data')]
+)
+def update_ip_range(ip_filter, live_rows):
+    if not ip_filter:
+        return "Enter an IP address or CIDR block.", build_ip_range_figure(empty_ip_range), False
+    try:
+        first, last = parse_cidr(ip_filter)
+    except ValueError:
+        return "Invalid IP address or CIDR block.", build_ip_range_figure(empty_ip_range), True
+    stats = get_ip_range_stats(first, last)
+    return (f"{stats['requests']:,} requests from {stats['addresses']:,} addresses in {ip_filter.strip()}",
+            build_ip_range_figure(stats['hourly']), False)
+
+
+# consolidated callback of the Viewership Statistics tab
+if consolidated_callbacks:
+    @background_callback(
+        'concurrent-progress',
+        [Output('total-requests-value', 'children'),
+         Output('peak-viewing-time', 'children'),
+         Output('peak-windows', 'children'),
+         Output('most-popular-sporting-event', 'children'),
+         Output('hourly-requests', 'figure'),
+         Output('sporting-event-requests', 'figure'),
+         Output('concurrent-sporting-events', 'figure'),
+         Output('unique-viewers-value', 'children'),
+         Output('hourly-unique-viewers', 'figure')],
+        [Input('sporting-event-dropdown-home', 'value'),
+         Input('country-dropdown-home', 'value'),
+         Input('continent-dropdown-home', 'value'),
+         Input('heatmap-resolution', 'value'),
+         Input('date-range-home', 'start_date'),
+         Input('date-range-home', 'end_date'),
+         Input('time-range', 'value'),
+         Input('peak-window', 'value'),
+         Input('live-rows', 'data')]
+    )
+    def update_viewership_statistics(selected_sporting_events, selected_countries, selected_continents, resolution,
+                                     start_date, end_date, time_range, peak_width, live_rows):
+        selected_days = day_range(start_date, end_date)
+        window = time_window(time_range)
+        report_progress(0, "Counting the visits")
+        stats = get_viewership_stats(selected_sporting_events, selected_countries, selected_continents, selected_days,
+                                     window)
+        report_progress(1 / 6, "Counting the visits per sporting event")
+        sporting_event_requests = get_sporting_event_requests(None, selected_countries, selected_continents,
+                                                              selected_days, window)
+        report_progress(2 / 6, "Binning the visits per sporting event")
+        events, visits, start = get_concurrent_sporting_events(resolution, selected_sporting_events,
+                                                               selected_countries, selected_continents, selected_days,
+                                                               window)
+        report_progress(3 / 6, "Estimating the unique viewers")
+        unique_viewer_stats = get_unique_viewer_stats(selected_sporting_events, selected_countries,
+                                                      selected_continents, selected_days, window)
+        report_progress(4 / 6, "Finding the peak windows")
+        peaks = get_peak_windows(selected_sporting_events, selected_countries, selected_continents, selected_days,
+                                 window, peak_width)
+        report_progress(5 / 6, "Building the figures")
+
+        return (stats['total_requests'],
+                *format_peak_viewing_time(peaks),
+                calculate_most_popular_sporting_event(sporting_event_requests),
+                build_hourly_figure(stats['hourly_requests'], peaks=peaks['peaks']),
+                build_pie_patch(sporting_event_requests.set_index('sporting_event')['count']
+                                .reindex(cube.sporting_events[:-1], fill_value=0)),
+                build_concurrent_figure(events, visits, start, resolution),
+                unique_viewer_stats['unique_viewers'],
+                build_hourly_figure(unique_viewer_stats['hourly_unique_viewers'], 'Unique Viewers'))
+
+
+# consolidated callback of the Demographic Data tab
+if consolidated_callbacks:
+    @background_callback(
+        'country-progress',
+        [Output('country-requests', 'figure'),
+         Output('age-requests', 'figure'),
+         Output('gender-requests', 'figure'),
+         Output('income-requests', 'figure'),
+         Output('country-unique-viewers', 'figure')],
+        [Input('sporting-event-dropdown', 'value'),
+         Input('country-dropdown', 'value'),
+         Input('continent-dropdown', 'value'),
+         Input('date-range', 'start_date'),
+         Input('date-range', 'end_date'),
+         Input('age-range', 'value'),
+         Input('age-edges', 'value'),
+         Input('live-rows', 'data')]
+    )
+    def update_demographic_data(selected_sporting_events, selected_countries, selected_continents, start_date,
+                                end_date, age_range, age_edges, live_rows):
+        selected_days = day_range(start_date, end_date)
+        report_progress(0, "Counting the visits per age, gender and income")
+        stats = get_demographic_stats(selected_sporting_events, selected_countries, selected_continents, selected_days)
+        report_progress(1 / 4, "Counting the visits per country")
+        country_requests = get_country_requests(selected_sporting_events, None, None, selected_days)
+        report_progress(2 / 4, "Estimating the unique viewers per country")
+        country_unique_viewers = get_country_unique_viewers(selected_sporting_events, None, None, selected_days)
+        report_progress(3 / 4, "Building the figures")
+
+        return (build_country_patch(country_requests),
+                build_age_figure(get_age_requests(stats['age_counts'], age_range, age_edges)),
+                build_pie_patch(stats['gender_requests']),
+                build_pie_patch(stats['income_requests']),
+                build_country_patch(country_unique_viewers))
+
+
+# client-side callbacks, slicing the count cube sent to the browser
+if clientside_callbacks:
+    # send the count cube on page load, and again when live rows arrive
+    @instrumented_callback(
+        Output('cube-data', 'data'),
+        [Input('live-rows', 'data')]
+    )
+    def update_cube_data(live_rows):
+        return get_cube_data()
+
+    for suffix in ['-home', '']:
+        app.clientside_callback(
+            ClientsideFunction(namespace='fun_olympics', function_name='sporting_event_options'),
+            Output(f'sporting-event-dropdown{suffix}', 'options'),
+            [Input(f'country-dropdown{suffix}', 'value'),
+             Input(f'continent-dropdown{suffix}', 'value'),
+             Input(f'date-range{suffix}', 'start_date'),
+             Input(f'date-range{suffix}', 'end_date'),
+             Input('cube-data', 'data')]
+        )
+        app.clientside_callback(
+            ClientsideFunction(namespace='fun_olympics', function_name='country_options'),
+            Output(f'country-dropdown{suffix}', 'options'),
+            [Input(f'sporting-event-dropdown{suffix}', 'value'),
+             Input(f'continent-dropdown{suffix}', 'value'),
+             Input(f'date-range{suffix}', 'start_date'),
+             Input(f'date-range{suffix}', 'end_date'),
+             Input('cube-data', 'data')]
+        )
+        app.clientside_callback(
+            ClientsideFunction(namespace='fun_olympics', function_name='continent_options'),
+            Output(f'continent-dropdown{suffix}', 'options'),
+            [Input(f'sporting-event-dropdown{suffix}', 'value'),
+             Input(f'country-dropdown{suffix}', 'value'),
+             Input(f'date-range{suffix}', 'start_date'),
+             Input(f'date-range{suffix}', 'end_date'),
+             Input('cube-data', 'data')]
+        )
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='fun_olympics', function_name='demographic_data'),
+        [Output('country-requests', 'figure'),
+         Output('age-requests', 'figure'),
+         Output('gender-requests', 'figure'),
+         Output('income-requests', 'figure')],
+        [Input('sporting-event-dropdown', 'value'),
+         Input('country-dropdown', 'value'),
+         Input('continent-dropdown', 'value'),
+         Input('date-range', 'start_date'),
+         Input('date-range', 'end_date'),
+         Input('age-range', 'value'),
+         Input('age-edges', 'value'),
+         Input('cube-data', 'data')],
+        [State('country-requests', 'figure'),
+         State('age-requests', 'figure'),
+         State('gender-requests', 'figure'),
+         State('income-requests', 'figure')]
+    )
 
 
 if __name__ == '__main__':
@@ -0,0 +1,204 @@
+// client-side callbacks of the dashboard: the count cube is sent to the browser once (see get_cube_data
+// in app.py), and the filters are applied by summing slices of it here, without a request to the server
+
+// function to format a number of minutes since midnight as a time of day, e.g. 05:30, for the tooltip of the
+// time of day slider
+window.dccFunctions = Object.assign({}, window.dccFunctions, {
+    formatMinutes: function (minutes) {
+        return `${String(Math.floor(minutes / 60)).padStart(2, '0')}:${String(minutes % 60).padStart(2, '0')}`;
+    },
+});
+
+// function to decode a base64 counts array into a typed array of its dtype
+function decodeCounts(encoded) {
+    if (!encoded.values) {
+        const bytes = Uint8Array.from(atob(encoded.data), character => character.charCodeAt(0));
+        const types = {uint8: Uint8Array, uint16: Uint16Array, uint32: Uint32Array};
+        encoded.values = new types[encoded.dtype](bytes.buffer);
+    }
+    return encoded.values;
+}
+
+// function to get the day number (days since 1970-01-01) of a date picker date
+function dayOfDate(date) {
+    return Math.floor(Date.parse(date.slice(0, 10)) / 86400000);
+}
+
+// function to get the slice [start, stop) of the day axis within the picked dates, as CountCube.selection
+function daySlice(cube, startDate, endDate) {
+    const numDays = cube.days.length;
+    const clip = value => Math.min(Math.max(value, 0), numDays);
+    const start = startDate ? clip(dayOfDate(startDate) - cube.days[0]) : 0;
+    const stop = endDate ? clip(dayOfDate(endDate) - cube.days[0] + 1) : numDays;
+    return [start, Math.max(start, stop)];
+}
+
+// function to get the mask of the selected sporting events (every event when none is selected)
+function eventMask(cube, selectedEvents) {
+    return cube.sporting_events.map(event => !selectedEvents || !selectedEvents.length
+        || selectedEvents.includes(event) && event !== cube.no_sporting_event);
+}
+
+// function to get the mask of the locations within the selected countries and continents
+function locationMask(cube, selectedCountries, selectedContinents) {
+    return cube.location_countries.map((country, location) =>
+        (!selectedCountries || !selectedCountries.length || selectedCountries.includes(cube.countries[country]))
+        && (!selectedContinents || !selectedContinents.length
+            || selectedContinents.includes(cube.continents[cube.location_continents[location]])));
+}
+
+// function to sum the counts of an axis over the selected filters, keeping the axis values and those of
+// the given cube axes ('day', 'sporting_event', 'location'); returns the sums indexed as
+// [kept day][kept sporting event][kept location][axis value], as CountCube.sum
+function sumCube(cube, axis, keep, selectedEvents, selectedCountries, selectedContinents, startDate, endDate) {
+    const counts = decodeCounts(cube.counts[axis]);
+    const [numDays, numEvents, numLocations, numValues] = cube.counts[axis].shape;
+    const [start, stop] = daySlice(cube, startDate, endDate);
+    const events = eventMask(cube, selectedEvents);
+    const locations = locationMask(cube, selectedCountries, selectedContinents);
+
+    const keptEvents = keep.includes('sporting_event') ? numEvents : 1;
+    const keptLocations = keep.includes('location') ? numLocations : 1;
+    const sums = new Float64Array((keep.includes('day') ? stop - start : 1) * keptEvents * keptLocations * numValues);
+    for (let day = start; day < stop; day++) {
+        const keptDay = keep.includes('day') ? day - start : 0;
+        for (let event = 0; event < numEvents; event++) {
+            if (!events[event]) continue;
+            const keptEvent = keptEvents > 1 ? event : 0;
+            for (let location = 0; location < numLocations; location++) {
+                if (!locations[location]) continue;
+                const offset = ((day * numEvents + event) * numLocations + location) * numValues;
+                const keptLocation = keptLocations > 1 ? location : 0;
+                const sum = ((keptDay * keptEvents + keptEvent) * keptLocations + keptLocation) * numValues;
+                for (let value = 0; value < numValues; value++) {
+                    sums[sum + value] += counts[offset + value];
+                }
+            }
+        }
+    }
+    return sums;
+}
+
+// function to sum the visits over the selected filters, keeping the values of the given cube axes; every
+// visit has a gender, so the visits are the gender counts summed over the genders
+function sumVisits(cube, keep, selectedEvents, selectedCountries, selectedContinents, startDate, endDate) {
+    const counts = sumCube(cube, 'gender', keep, selectedEvents, selectedCountries, selectedContinents, startDate,
+                           endDate);
+    const numValues = cube.labels.gender.length;
+    return Array.from({length: counts.length / numValues}, (_, index) =>
+        counts.slice(index * numValues, (index + 1) * numValues).reduce((total, count) => total + count, 0));
+}
+
+// function to total the counts of each location by country or by continent
+function totalBy(names, codes, locationCounts) {
+    const totals = {};
+    names.forEach(name => totals[name] = 0);
+    codes.forEach((code, location) => totals[names[code]] += locationCounts[location]);
+    return totals;
+}
+
+// function to get the countries of the selected continents (or the reverse) from the country and continent
+// codes of each location, as DimensionIndex.countries_in (every name when none is selected)
+function namesWithin(names, codes, selectionNames, selectionCodes, selected) {
+    if (!selected || !selected.length) return names;
+    const within = new Set(codes.filter((code, location) =>
+        selected.includes(selectionNames[selectionCodes[location]])));
+    return names.filter((name, code) => within.has(code));
+}
+
+// function to build dropdown options labelled with their visit counts, as build_options
+function buildOptions(values, counts) {
+    return values.map(value => ({label: `${value} (${(counts[value] || 0).toLocaleString('en-US')})`, value: value}));
+}
+
+// function to parse the upper edges of the age bins, null when they are not whole numbers, as parse_age_edges
+function parseAgeEdges(text) {
+    const edges = (text || '').replace(/,/g, ' ').split(/\s+/).filter(edge => edge);
+    if (!edges.every(edge => /^[-+]?\d+$/.test(edge))) return null;
+    return Array.from(new Set(edges.map(Number))).sort((a, b) => a - b);
+}
+
+// function to bin the per-age counts into the ages from first to last, split after each of the given upper
+// edges, with differences of prefix sums; returns the bin labels and counts, as age_histogram
+function ageHistogram(ages, counts, first, last, edges) {
+    const bounds = [first].concat(edges.filter(edge => first <= edge && edge < last).map(edge => edge + 1), [last + 1]);
+    const prefix = [0];
+    counts.forEach(count => prefix.push(prefix[prefix.length - 1] + count));
+    const position = age => Math.min(Math.max(age - ages[0], 0), ages.length);
+    const labels = [], binCounts = [];
+    for (let index = 0; index + 1 < bounds.length; index++) {
+        const start = bounds[index], stop = bounds[index + 1];
+        const oldest = ages[ages.length - 1];
+        labels.push(stop - 1 >= oldest && start < oldest ? `${start}+` : stop - 1 > start ? `${start}-${stop - 1}` : `${start}`);
+        binCounts.push(prefix[position(stop)] - prefix[position(start)]);
+    }
+    return [labels, binCounts];
+}
+
+// function to copy a figure with new properties of its first trace and of its layout
+function updateFigure(figure, trace, layout) {
+    return Object.assign({}, figure, {
+        data: [Object.assign({}, figure.data[0], trace)].concat(figure.data.slice(1)),
+        layout: Object.assign({}, figure.layout, layout || {}),
+    });
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    fun_olympics: {
+        // dropdown options of the sporting events, counted under the selected countries, continents and dates
+        sporting_event_options: function (selectedCountries, selectedContinents, startDate, endDate, cube) {
+            if (!cube) throw window.dash_clientside.PreventUpdate;
+            const counts = sumVisits(cube, ['sporting_event'], null, selectedCountries, selectedContinents, startDate,
+                                     endDate);
+            const totals = {};
+            cube.sporting_events.forEach((event, index) => totals[event] = counts[index]);
+            return buildOptions(cube.option_events, totals);
+        },
+
+        // dropdown options of the countries of the selected continents, counted under the selected sporting
+        // events, continents and dates
+        country_options: function (selectedEvents, selectedContinents, startDate, endDate, cube) {
+            if (!cube) throw window.dash_clientside.PreventUpdate;
+            const counts = sumVisits(cube, ['location'], selectedEvents, null, selectedContinents, startDate, endDate);
+            return buildOptions(namesWithin(cube.countries, cube.location_countries, cube.continents,
+                                            cube.location_continents, selectedContinents),
+                                totalBy(cube.countries, cube.location_countries, counts));
+        },
+
+        // dropdown options of the continents of the selected countries, counted under the selected sporting
+        // events, countries and dates
+        continent_options: function (selectedEvents, selectedCountries, startDate, endDate, cube) {
+            if (!cube) throw window.dash_clientside.PreventUpdate;
+            const counts = sumVisits(cube, ['location'], selectedEvents, selectedCountries, null, startDate, endDate);
+            return buildOptions(namesWithin(cube.continents, cube.location_continents, cube.countries,
+                                            cube.location_countries, selectedCountries),
+                                totalBy(cube.continents, cube.location_continents, counts));
+        },
+
+        // figures of the Demographic Data tab
+        demographic_data: function (selectedEvents, selectedCountries, selectedContinents, startDate, endDate,
+                                    ageRange, ageEdges, cube, countryFigure, ageFigure, genderFigure, incomeFigure) {
+            if (!cube) throw window.dash_clientside.PreventUpdate;
+            const locationCounts = sumVisits(cube, ['location'], selectedEvents, null, null, startDate, endDate);
+            const countryTotals = totalBy(cube.countries, cube.location_countries, locationCounts);
+            const countryCounts = cube.countries.map(country => countryTotals[country] || null);
+            const ages = cube.labels.age.map(Number);
+            const [first, last] = ageRange || [ages[0], ages[ages.length - 1]];
+            const [ageGroups, ageCounts] = ageHistogram(ages, sumCube(cube, 'age', [], selectedEvents,
+                selectedCountries, selectedContinents, startDate, endDate), first, last,
+                parseAgeEdges(ageEdges) || cube.default_age_edges);
+            return [
+                updateFigure(countryFigure, {z: countryCounts}, {
+                    coloraxis: Object.assign({}, countryFigure.layout.coloraxis,
+                                             {cmax: Math.max(0, ...countryCounts.filter(count => count))}),
+                }),
+                updateFigure(ageFigure, {x: ageGroups, y: ageCounts}),
+                updateFigure(genderFigure, {values: Array.from(sumCube(cube, 'gender', [], selectedEvents,
+                    selectedCountries, selectedContinents, startDate, endDate))}),
+                updateFigure(incomeFigure, {values: Array.from(sumCube(cube, 'income_status', [], selectedEvents,
+                    selectedCountries, selectedContinents, startDate, endDate))}),
+            ];
+        },
+    },
+});
+
@@ -0,0 +1,160 @@
+import argparse
+import inspect
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from generate_data import generate_log_file_batch
+
+# default dataset sizes, in rows
+DEFAULT_SIZES = [100000, 1000000, 10000000]
+
+# filter values combined into the benchmarked filter matrix
+sporting_event_filters = [None, ['Tennis'], ['Basketball', 'Swimming', 'Athletics - Track']]
+country_filters = [None, ['France'], ['France', 'Kenya', 'Japan', 'Brazil']]
+continent_filters = [None, ['Europe']]
+
+# values of the callback arguments that are not filters
+default_arguments = {
+    'resolution': 15,
+    'live_rows': 0,
+    'start_date': None,
+    'end_date': None,
+    'top_n': 10,
+    'error_status': 404,
+    'ip_filter': '10.0.0.0/8',
+    'age_range': None,
+    'age_edges': "24, 34, 44, 54, 64",
+    'time_range': [0, 24 * 60],
+    'peak_width': 60,
+}
+
+
+# function to generate the deterministic dataset of a size unless it already exists, returns its path
+def prepare_dataset(data_dir, num_rows, seed):
+    path = os.path.join(data_dir, f"fun_olympics_{num_rows}_{seed}.csv")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        generate_log_file_batch(num_rows, path + ".tmp", seed=seed)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+# function to get the dashboard callbacks in the order they are defined
+def get_callbacks(app):
+    callbacks = [(name, function) for name, function in vars(app).items()
+                 if name.startswith('update_') and name != 'update_live_rows' and inspect.isfunction(function)]
+    return sorted(callbacks, key=lambda callback: inspect.unwrap(callback[1]).__code__.co_firstlineno)
+
+
+# function to call a callback once, returns its wall time in seconds and its output
+def time_callback(callback, arguments):
+    start = time.perf_counter()
+    output = callback(*arguments)
+    return time.perf_counter() - start, output
+
+
+# function to benchmark every callback of the dashboard over the filter matrix, run in a fresh process
+# per dataset so the dataset is loaded by importing the app, exactly as when it is served
+def run_benchmark(repeat):
+    start = time.perf_counter()
+    import app
+    import plotly
+    load_seconds = time.perf_counter() - start
+
+    results = []
+    for name, callback in get_callbacks(app):
+        parameters = list(inspect.signature(callback).parameters)
+        for filters in itertools.product(sporting_event_filters, country_filters, continent_filters):
+            values = dict(default_arguments, selected_sporting_events=filters[0], selected_countries=filters[1],
+                          selected_continents=filters[2])
+            arguments = [values[parameter] for parameter in parameters]
+
+            # first call computes the result (cold), the repeats are answered from the result cache (warm)
+            app.result_cache.clear()
+            cold_seconds, output = time_callback(callback, arguments)
+            warm_seconds = min(time_callback(callback, arguments)[0] for _ in range(repeat))
+
+            # peak memory of computing the result, traced in a separate call since tracing slows it down
+            app.result_cache.clear()
+            tracemalloc.start()
+            callback(*arguments)
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results.append({
+                'callback': name,
+                'filters': dict(zip(['sporting_events', 'countries', 'continents'], filters)),
+                'cold_seconds': cold_seconds,
+                'warm_seconds': warm_seconds,
+                'peak_bytes': peak_bytes,
+                'response_bytes': len(json.dumps(output, cls=plotly.utils.PlotlyJSONEncoder)),
+            })
+    return {'rows': int(app.cube.totals.sum(dtype=np.int64)), 'load_seconds': load_seconds, 'callbacks': results}
+
+
+# function to benchmark one dataset in a subprocess with its own empty result cache
+def benchmark_dataset(path, repeat):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, FUN_OLYMPICS_DATA=path, FUN_OLYMPICS_CACHE=os.path.join(cache_dir, "cache.sqlite"))
+        env.pop('FUN_OLYMPICS_LIVE', None)
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", "--repeat", str(repeat)],
+                                 env=env, stdout=subprocess.PIPE, check=True,
+                                 cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(process.stdout)
+
+
+# function to get the current git commit, so results can be compared between commits
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              check=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# function to print the per-callback totals of a dataset
+def print_summary(dataset):
+    print(f"{dataset['rows']} rows, loaded in {dataset['load_seconds']:.2f}s")
+    for name in dict.fromkeys(result['callback'] for result in dataset['callbacks']):
+        results = [result for result in dataset['callbacks'] if result['callback'] == name]
+        print(f"  {name:45s} cold {max(r['cold_seconds'] for r in results) * 1000:9.2f} ms"
+              f"  warm {max(r['warm_seconds'] for r in results) * 1000:8.2f} ms"
+              f"  peak {max(r['peak_bytes'] for r in results) / 2 ** 20:8.2f} MiB"
+              f"  response {max(r['response_bytes'] for r in results) / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard callbacks on generated logs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="dataset sizes, in rows")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the generated datasets")
+    parser.add_argument("--data-dir", default="benchmark_data", help="directory of the generated datasets")
+    parser.add_argument("--repeat", type=int, default=3, help="warm calls per callback and filter combination")
+    parser.add_argument("--output", default="benchmark_results.json", help="path of the JSON results")
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        json.dump(run_benchmark(args.repeat), sys.stdout)
+        sys.exit()
+
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'seed': args.seed,
+        'datasets': [],
+    }
+    for num_rows in args.sizes:
+        dataset = benchmark_dataset(prepare_dataset(args.data_dir, num_rows, args.seed), args.repeat)
+        print_summary(dataset)
+        results['datasets'].append(dataset)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
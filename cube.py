@@ -0,0 +1,384 @@
+import numpy as np
+import pandas as pd
+
+from hyperloglog import SketchGrid, estimate
+
+
+# label of the sporting event slot holding requests to non-event pages
+NO_SPORTING_EVENT = "none"
+
+# minutes in a day, the resolution of the time-of-day counts
+MINUTES_PER_DAY = 24 * 60
+
+# axes of the count cube, in order; the day axis holds consecutive day numbers (days since 1970-01-01),
+# and the location axis holds the distinct (country, continent) pairs so that country and continent
+# filters are both masks over the same axis
+CUBE_AXES = ['day', 'sporting_event', 'location', 'hour', 'age', 'gender', 'income_status']
+
+# axes counted separately over the day, sporting event and location axes: the joint counts of every axis
+# would grow with the product of all of them times the number of days, while the charts only ever break
+# the visits down by one of these at a time
+COUNT_AXES = CUBE_AXES[3:]
+
+# default upper edges of the age bins, the age groups 16-24, 25-34, 35-44, 45-54, 55-64 and 65+
+DEFAULT_AGE_EDGES = [24, 34, 44, 54, 64]
+
+
+# per-minute counts of each day and cell of a grid (sporting event and location), kept sparse per day as
+# sorted keys (cell * MINUTES_PER_DAY + minute) with their counts, like the viewer sketches: a day holds at
+# most one entry per row, where dense counts would hold one per cell and minute of the day
+class MinuteGrid:
+
+    def __init__(self, num_cells):
+        self.num_cells = num_cells
+        self.key_dtype = np.uint32 if num_cells * MINUTES_PER_DAY <= 2 ** 32 else np.int64
+        self.entries = {}
+
+    # function to count rows at their days (day numbers), cells (flat indexes into the grid) and minutes of day
+    def add(self, days, cells, minutes):
+        if not len(days):
+            return
+        first_day = int(days.min())
+        keys = ((days.astype(np.int64) - first_day) * self.num_cells + cells) * MINUTES_PER_DAY + minutes
+        keys, counts = np.unique(keys, return_counts=True)
+        days, keys = np.divmod(keys, self.num_cells * MINUTES_PER_DAY)
+        day_starts = np.flatnonzero(np.append(True, days[1:] != days[:-1]))
+        for start, end in zip(day_starts, np.append(day_starts[1:], len(keys))):
+            self._add_day(first_day + int(days[start]), keys[start:end].astype(self.key_dtype),
+                          counts[start:end].astype(np.uint32))
+
+    # function to add sorted unique keys and their counts to the counts of a day
+    def _add_day(self, day, keys, counts):
+        if day not in self.entries:
+            self.entries[day] = (keys, counts)
+            return
+        day_keys, day_counts = self.entries[day]
+        positions = np.searchsorted(day_keys, keys)
+        found = day_keys[np.minimum(positions, len(day_keys) - 1)] == keys
+        day_counts[positions[found]] += counts[found]
+        self.entries[day] = (np.insert(day_keys, positions[~found], keys[~found]),
+                             np.insert(day_counts, positions[~found], counts[~found]))
+
+    # function to sum the counts of the given cells into groups, per day and minute: cell_groups maps each
+    # flat cell to its group. The keys of a cell are contiguous, so only the given cells are read
+    def sum(self, days, cells, cell_groups, num_groups):
+        summed = np.zeros((num_groups, len(days), MINUTES_PER_DAY), dtype=np.int64)
+        cells = np.asarray(cells, dtype=np.int64)
+        for index, day in enumerate(days):
+            if day not in self.entries:
+                continue
+            keys, counts = self.entries[day]
+            starts = np.searchsorted(keys, cells * MINUTES_PER_DAY)
+            lengths = np.searchsorted(keys, (cells + 1) * MINUTES_PER_DAY) - starts
+            positions = np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            cell_keys = keys[positions].astype(np.int64)
+            bins = cell_groups[cell_keys // MINUTES_PER_DAY] * MINUTES_PER_DAY + cell_keys % MINUTES_PER_DAY
+            summed[:, index] = np.bincount(bins, weights=counts[positions],
+                                           minlength=num_groups * MINUTES_PER_DAY).reshape(num_groups, -1)
+        return summed
+
+
+# dense count cube over the low-cardinality dimensions of the log, so every chart can be
+# answered by summing a slice of the cube instead of grouping the raw rows
+class CountCube:
+
+    def __init__(self, sporting_events, locations, ages, genders, income_statuses):
+        self.sporting_events = list(sporting_events) + [NO_SPORTING_EVENT]
+        self.locations = pd.DataFrame(locations, columns=['country', 'continent'])
+        self.countries = sorted(set(self.locations['country']))
+        self.location_countries = np.searchsorted(self.countries, self.locations['country'])
+        self.continents = sorted(set(self.locations['continent']))
+        self.location_continents = np.searchsorted(self.continents, self.locations['continent'])
+        self.hours = np.arange(24)
+        # the age axis holds every age from the youngest to the oldest viewer, one count per age, so the
+        # visits of any age range are a difference of prefix sums of the counts (see age_histogram)
+        self.ages = np.asarray(ages, dtype=np.int64)
+        self.genders = list(genders)
+        self.income_statuses = list(income_statuses)
+        self.labels = {'hour': self.hours, 'age': self.ages, 'gender': self.genders,
+                       'income_status': self.income_statuses}
+
+        # the day axis starts empty and grows to cover the days of the added rows
+        self.days = np.arange(0)
+        self.shape = (0, len(self.sporting_events), len(self.locations))
+        self.totals = np.zeros(self.shape, dtype=np.uint32)
+        self.counts = {axis: np.zeros(self.shape + (len(self.labels[axis]),), dtype=np.uint32) for axis in COUNT_AXES}
+
+        # per-minute counts of each day, sporting event and continent, a 2-D histogram over time of day
+        # kept next to the cube so time charts can be binned at any whole-minute resolution; the counts of
+        # each location are kept as well, sparse, for country filters
+        self.minute_counts = np.zeros(self.shape[:2] + (len(self.continents), MINUTES_PER_DAY), dtype=np.uint32)
+        self.location_minutes = MinuteGrid(len(self.sporting_events) * len(self.locations))
+
+        # HyperLogLog sketches of the IP addresses of each day, sporting event, location and hour, merged
+        # into approximate unique viewer counts of any filter
+        self.viewers = SketchGrid((len(self.sporting_events), len(self.locations), len(self.hours)))
+
+    # function to build a cube from a loaded log frame
+    @classmethod
+    def from_frame(cls, frame, sporting_events):
+        locations = frame[['country', 'continent']].drop_duplicates().sort_values(['country', 'continent'])
+        cube = cls(sporting_events, locations.itertuples(index=False, name=None),
+                   np.arange(frame['age'].min(), frame['age'].max() + 1),
+                   sorted(frame['gender'].unique()),
+                   sorted(frame['income_status'].unique()))
+        if cube.add_frame(frame):
+            raise ValueError("log rows contain values outside the cube dimensions")
+        return cube
+
+    # function to build a cube over known dimensions from a stream of log frames, one frame at a time,
+    # so the log never has to be in memory as a whole
+    @classmethod
+    def from_frames(cls, frames, sporting_events, locations, ages, genders, income_statuses):
+        cube = cls(sporting_events, locations, ages, genders, income_statuses)
+        for frame in frames:
+            if cube.add_frame(frame):
+                raise ValueError("log rows contain values outside the cube dimensions")
+        return cube
+
+    # function to extend the day axis to cover the days from first to last, padding the counts with zeros
+    def extend_days(self, first, last):
+        if len(self.days):
+            first, last = min(first, self.days[0]), max(last, self.days[-1])
+            before, after = self.days[0] - first, last - self.days[-1]
+        else:
+            before, after = 0, last - first + 1
+        if not before and not after:
+            return
+
+        def pad(counts):
+            return np.pad(counts, [(before, after)] + [(0, 0)] * (counts.ndim - 1))
+
+        self.days = np.arange(first, last + 1)
+        self.shape = (len(self.days),) + self.shape[1:]
+        self.totals = pad(self.totals)
+        self.counts = {axis: pad(counts) for axis, counts in self.counts.items()}
+        self.minute_counts = pad(self.minute_counts)
+
+    # function to encode the rows of a frame as cube coordinates, one code array per axis, and the
+    # mask of rows whose values all lie within the cube dimensions
+    def coordinates(self, frame):
+        event_codes = pd.Categorical(frame['sporting_event'], categories=self.sporting_events[:-1]).codes.astype(np.int64)
+        event_codes[event_codes < 0] = len(self.sporting_events) - 1
+
+        location_index = pd.MultiIndex.from_frame(self.locations)
+        location_codes = location_index.get_indexer(pd.MultiIndex.from_frame(frame[['country', 'continent']]))
+
+        day_codes = frame['date'].to_numpy().astype(np.int64) - (self.days[0] if len(self.days) else 0)
+        day_codes[(day_codes < 0) | (day_codes >= len(self.days))] = -1
+
+        age_codes = frame['age'].to_numpy().astype(np.int64) - (self.ages[0] if len(self.ages) else 0)
+        age_codes[(age_codes < 0) | (age_codes >= len(self.ages))] = -1
+
+        minutes = frame['time'].to_numpy() // 60
+        codes = [
+            day_codes,
+            event_codes,
+            location_codes,
+            minutes // 60,
+            age_codes,
+            pd.Categorical(frame['gender'], categories=self.genders).codes,
+            pd.Categorical(frame['income_status'], categories=self.income_statuses).codes,
+        ]
+        valid = np.logical_and.reduce([code >= 0 for code in codes])
+        return codes + [minutes], valid
+
+    # function to add the rows of a frame to the cube counts and viewer sketches, returns the number of rows skipped
+    # because their values lie outside the cube dimensions; the day axis is extended to new days first
+    def add_frame(self, frame):
+        dates = frame['date'].to_numpy()
+        if len(dates):
+            self.extend_days(int(dates.min()), int(dates.max()))
+        codes, valid = self.coordinates(frame)
+        ip_addresses = frame['ip_address'].to_numpy()
+        if not valid.all():
+            codes = [code[valid] for code in codes]
+            ip_addresses = ip_addresses[valid]
+        cells = np.ravel_multi_index(codes[:3], self.shape)
+        add_cells(self.totals, cells)
+        for axis, code in zip(CUBE_AXES[3:], codes[3:-1]):
+            add_cells(self.counts[axis], cells * len(self.labels[axis]) + code)
+        add_cells(self.minute_counts, np.ravel_multi_index(
+            (codes[0], codes[1], self.location_continents[codes[2]], codes[-1]), self.minute_counts.shape))
+        self.location_minutes.add(self.days[codes[0]], codes[1] * len(self.locations) + codes[2], codes[-1])
+        self.viewers.add(self.days[codes[0]], np.ravel_multi_index(codes[1:4], self.viewers.shape), ip_addresses)
+        return int(len(valid) - valid.sum())
+
+    # function to get the positions of the selected values along the sporting event and location axes,
+    # and the slice of the day axis within the selected (first, last) range of day numbers, whose ends
+    # may be None
+    def selection(self, selected_sporting_events=None, selected_countries=None, selected_continents=None,
+                  selected_days=None):
+        events = None
+        if selected_sporting_events:
+            events = np.flatnonzero(np.isin(self.sporting_events[:-1], list(selected_sporting_events)))
+
+        locations = None
+        if selected_countries or selected_continents:
+            mask = np.ones(len(self.locations), dtype=bool)
+            if selected_countries:
+                mask &= self.locations['country'].isin(selected_countries).to_numpy()
+            if selected_continents:
+                mask &= self.locations['continent'].isin(selected_continents).to_numpy()
+            locations = np.flatnonzero(mask)
+
+        days = slice(0, len(self.days))
+        if selected_days and len(self.days):
+            first, last = selected_days
+            start = 0 if first is None else int(np.clip(first - self.days[0], 0, len(self.days)))
+            stop = len(self.days) if last is None else int(np.clip(last - self.days[0] + 1, 0, len(self.days)))
+            days = slice(start, max(start, stop))
+        return events, locations, days
+
+    # function to get the day numbers within the selected range, the labels of a kept day axis
+    def days_in(self, selected_days=None):
+        return self.days[self.selection(selected_days=selected_days)[2]]
+
+    # function to sum the per-minute counts over the selected filters, keeping the sporting event axis and
+    # binning time into buckets of the given number of minutes over the consecutive selected days; the dense
+    # counts by continent answer every filter but a country filter, which sums the sparse counts of its
+    # locations
+    def sum_minutes(self, resolution=1, selected_sporting_events=None, selected_countries=None,
+                    selected_continents=None, selected_days=None):
+        events, locations, days = self.selection(selected_sporting_events, selected_countries, selected_continents,
+                                                 selected_days)
+        if selected_countries:
+            events = np.arange(len(self.sporting_events)) if events is None else events
+            cells = (events[:, np.newaxis] * len(self.locations) + locations).reshape(-1)
+            cell_groups = np.repeat(np.arange(len(self.sporting_events)), len(self.locations))
+            counts = self.location_minutes.sum(self.days[days].tolist(), cells, cell_groups, len(self.sporting_events))
+        else:
+            counts = self.minute_counts[days]
+            if selected_continents:
+                counts = counts[:, :, np.flatnonzero(np.isin(self.continents, list(selected_continents)))]
+            counts = counts.sum(axis=2, dtype=np.int64)
+            if events is not None:
+                selected = np.zeros(len(self.sporting_events), dtype=bool)
+                selected[events] = True
+                counts[:, ~selected] = 0
+            counts = counts.transpose(1, 0, 2)
+        num_days = counts.shape[1]
+        counts = counts.reshape(len(self.sporting_events), num_days, MINUTES_PER_DAY // resolution, resolution)
+        return counts.sum(axis=3).reshape(len(self.sporting_events), num_days * MINUTES_PER_DAY // resolution)
+
+    # function to sum the cube over the selected filters, keeping the given axes ('day', 'sporting_event'
+    # and 'location' may be kept along with one of the other axes); a kept day axis holds the selected days
+    def sum(self, keep=(), selected_sporting_events=None, selected_countries=None, selected_continents=None,
+            selected_days=None):
+        axes = [name for name in COUNT_AXES if name in keep]
+        if len(axes) > 1:
+            raise ValueError(f"the cube keeps at most one of {', '.join(COUNT_AXES)}")
+        counts = self.counts[axes[0]] if axes else self.totals
+
+        events, locations, days = self.selection(selected_sporting_events, selected_countries, selected_continents,
+                                                 selected_days)
+        counts = counts[days]
+        if events is not None:
+            counts = counts[:, events]
+        if locations is not None:
+            counts = counts[:, :, locations]
+
+        summed = tuple(axis for axis, name in enumerate(CUBE_AXES[:3]) if name not in keep)
+        counts = counts.sum(axis=summed, dtype=np.int64)
+
+        # put the non-none events back in their place, so kept axes always line up with the labels
+        if events is not None and 'sporting_event' in keep:
+            axis = int('day' in keep)
+            full = np.zeros(counts.shape[:axis] + (len(self.sporting_events),) + counts.shape[axis + 1:], dtype=np.int64)
+            full[(slice(None),) * axis + (events,)] = counts
+            counts = full
+        if locations is not None and 'location' in keep:
+            axis = int('day' in keep) + int('sporting_event' in keep)
+            full = np.zeros(counts.shape[:axis] + (len(self.locations),) + counts.shape[axis + 1:], dtype=np.int64)
+            full[(slice(None),) * axis + (locations,)] = counts
+            counts = full
+        return counts
+
+    # function to estimate the unique viewers (distinct IP addresses) over the selected filters, keeping the
+    # given axes ('day', 'country' and 'hour'), by merging the viewer sketches of the selected cells
+    def unique_viewers(self, keep=(), selected_sporting_events=None, selected_countries=None,
+                       selected_continents=None, selected_days=None, selected_hours=None):
+        events, locations, days = self.selection(selected_sporting_events, selected_countries, selected_continents,
+                                                 selected_days)
+        num_countries = len(self.countries) if 'country' in keep else 1
+        num_hours = len(self.hours) if 'hour' in keep else 1
+        location_groups = self.location_countries if 'country' in keep else np.zeros(len(self.locations), dtype=np.int64)
+        hour_groups = self.hours if 'hour' in keep else np.zeros(len(self.hours), dtype=np.int64)
+
+        # group of each (sporting event, location, hour) cell, -1 for the cells outside the filters
+        cell_groups = np.broadcast_to(location_groups[:, np.newaxis] * num_hours + hour_groups,
+                                      self.viewers.shape).copy()
+        if events is not None:
+            cell_groups[np.setdiff1d(np.arange(len(self.sporting_events)), events)] = -1
+        if locations is not None:
+            cell_groups[:, np.setdiff1d(np.arange(len(self.locations)), locations)] = -1
+        if selected_hours is not None:
+            cell_groups[:, :, np.setdiff1d(self.hours, selected_hours)] = -1
+
+        registers = self.viewers.merge(self.days[days].tolist(), cell_groups.reshape(-1), num_countries * num_hours,
+                                       events)
+        if 'day' not in keep:
+            registers = registers.max(axis=0, initial=0, keepdims=True)
+        shape = (len(registers),) * ('day' in keep) + (num_countries,) * ('country' in keep) + (num_hours,) * ('hour' in keep)
+        return np.rint(estimate(registers)).astype(np.int64).reshape(shape)
+
+
+# function to take the prefix sums of per-minute counts (events x consecutive days of minutes, as
+# sum_minutes returns them) over the minutes of each day, with a leading zero: the visits of
+# any window of minutes of a day are then a difference of two prefix sums
+def minute_prefix_sums(counts):
+    counts = counts.reshape(counts.shape[0], counts.shape[1] // MINUTES_PER_DAY, MINUTES_PER_DAY)
+    return np.concatenate([np.zeros(counts.shape[:2] + (1,), dtype=np.int64),
+                           np.cumsum(counts, axis=2, dtype=np.int64)], axis=2)
+
+
+# function to get the visits of the bins between the given minutes of day (bin i from edges[i] to
+# edges[i + 1]) within the window of minutes from first to last, from prefix sums of the minute counts
+def window_counts(prefix_sums, edges, first=0, last=MINUTES_PER_DAY):
+    edges = np.clip(edges, first, last)
+    return prefix_sums[..., edges[1:]] - prefix_sums[..., edges[:-1]]
+
+
+# function to find the k busiest non-overlapping windows of the given width in a series of per-minute counts:
+# the sums of every window are differences of prefix sums, and each peak taken clears the windows
+# overlapping it before the next is taken. Given a mask of the allowed starts (one per window), only those
+# windows are taken. Returns the (start, visits) of each peak, busiest first
+def peak_windows(counts, width, k, allowed=None):
+    prefix = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+    sums = prefix[min(width, len(counts)):] - prefix[:max(len(counts) - width, 0) + 1]
+    if allowed is not None:
+        sums[~allowed] = -1
+    peaks = []
+    for _ in range(k):
+        start = int(np.argmax(sums))
+        if sums[start] <= 0:
+            break
+        peaks.append((start, int(sums[start])))
+        sums[max(start - width + 1, 0):start + width] = -1
+    return peaks
+
+
+# function to bin the visits of each age (counts over the consecutive ages) into the ages from first to last,
+# split after each of the given upper edges; the counts of each bin are a difference of two prefix sums, so
+# any bins are computed from the per-age counts without touching the cube. Returns the bin labels ("25-34",
+# "65+" for a last bin open to the oldest age) and counts
+def age_histogram(ages, counts, first, last, edges):
+    bounds = [first] + [edge + 1 for edge in sorted(set(edges)) if first <= edge < last] + [last + 1]
+    prefix = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+    positions = np.clip(np.asarray(bounds, dtype=np.int64) - (ages[0] if len(ages) else 0), 0, len(ages))
+    labels = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        if len(ages) and stop - 1 >= ages[-1] and start < ages[-1]:
+            labels.append(f"{start}+")
+        else:
+            labels.append(f"{start}-{stop - 1}" if stop - 1 > start else str(start))
+    return labels, prefix[positions[1:]] - prefix[positions[:-1]]
+
+
+# function to add one to each of the given flat cells of a counts array; large batches are counted with
+# a single bincount over the whole array, small ones (live ingestion) cell by cell
+def add_cells(counts, cells):
+    if len(cells) >= counts.size // 64:
+        counts += np.bincount(cells, minlength=counts.size).reshape(counts.shape).astype(np.uint32)
+    else:
+        np.add.at(counts.reshape(-1), cells, 1)
@@ -0,0 +1,319 @@
+import glob
+import io
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from ip_index import IpIndex
+
+
+# layout version of the snapshot, bump it whenever the stored columns change
+SNAPSHOT_FORMAT = 5
+
+# columns of the log stored as dictionary codes
+CATEGORICAL_COLUMNS = ['request_method', 'path', 'country', 'continent', 'gender', 'income_status']
+
+# column order of the CSV header
+COLUMNS = ['time', 'ip_address', 'request_method', 'path', 'status_code', 'country', 'continent', 'gender',
+           'age', 'income_status']
+
+# column order of the loaded frame: the date of each row, split from its timestamp, then the CSV columns
+FRAME_COLUMNS = ['date'] + COLUMNS
+
+# dtypes the CSV columns are read with; times are categories as well, so each distinct time is parsed once
+CSV_DTYPES = {column: 'category' for column in CATEGORICAL_COLUMNS + ['time']}
+
+# date of the rows of logs written with times of day only ("HH:MM:SS" instead of "YYYY-MM-DD HH:MM:SS")
+DEFAULT_LOG_DATE = "2024-07-26"
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+# function to parse a categorical column of "YYYY-MM-DD HH:MM:SS" timestamps (or "HH:MM:SS" times of
+# DEFAULT_LOG_DATE) into days since 1970-01-01 and seconds since midnight; only the distinct timestamps
+# (the categories) are parsed
+def parse_times(times):
+    categories = times.cat.categories.astype(str)
+    categories = categories.where(categories.str.len() > 8, DEFAULT_LOG_DATE + " " + categories)
+    timestamps = pd.to_datetime(categories, format="%Y-%m-%d %H:%M:%S").to_numpy().astype(np.int64) // 10 ** 9
+    days, seconds = np.divmod(timestamps, SECONDS_PER_DAY)
+    codes = times.cat.codes.to_numpy()
+    return days.astype(np.int32)[codes], seconds.astype(np.int32)[codes]
+
+
+# function to get the day number (days since 1970-01-01) of a date
+def day_of_date(date):
+    return int(pd.Timestamp(date).normalize().value // (SECONDS_PER_DAY * 10 ** 9))
+
+
+# function to get the date of a day number
+def date_of_day(day):
+    return pd.Timestamp(int(day) * SECONDS_PER_DAY, unit='s')
+
+
+# function to parse dotted-quad IP addresses into uint32, one pass over the characters of all
+# addresses at a time instead of splitting every string
+def parse_ip_addresses(ip_addresses):
+    characters = ip_addresses.to_numpy().astype("S15").view(np.uint8).reshape(len(ip_addresses), 15)
+    parsed = np.zeros(len(ip_addresses), dtype=np.uint32)
+    octet = np.zeros(len(ip_addresses), dtype=np.uint32)
+    for position in range(characters.shape[1]):
+        character = characters[:, position]
+        is_digit = (character >= ord("0")) & (character <= ord("9"))
+        is_dot = character == ord(".")
+        octet = np.where(is_digit, octet * 10 + (character - ord("0")), octet)
+        parsed = np.where(is_dot, (parsed << 8) | octet, parsed)
+        octet[is_dot] = 0
+    return (parsed << 8) | octet
+
+
+# function to format uint32 IP addresses as dotted quads
+def format_ip_addresses(ip_addresses):
+    return [".".join(str((int(ip_address) >> shift) & 255) for shift in (24, 16, 8, 0)) for ip_address in ip_addresses]
+
+
+# function to get the smallest signed integer dtype pandas uses for codes of this many categories
+def codes_dtype(num_categories):
+    for dtype in (np.int8, np.int16, np.int32):
+        if num_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+# function to get the size of a file up to its last complete line, so a log that is still being
+# appended to is only read up to a line boundary
+def complete_size(path):
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        while size > 0:
+            block = min(size, 64 * 1024)
+            f.seek(size - block)
+            newline = f.read(block).rfind(b"\n")
+            if newline >= 0:
+                return size - block + newline + 1
+            size -= block
+    return 0
+
+
+# read-only file object over the first bytes of a file
+class FilePrefix(io.RawIOBase):
+
+    def __init__(self, path, size):
+        self.file = open(path, "rb")
+        self.remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        read = self.file.readinto(memoryview(buffer)[:self.remaining])
+        self.remaining -= read
+        return read
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+# function to convert a frame read from a CSV log into typed columns and the categories of the coded columns
+def columns_from_frame(frame):
+    dates, times = parse_times(frame['time'])
+    columns = {
+        'date': dates,
+        'time': times,
+        'ip_address': parse_ip_addresses(frame['ip_address']),
+        'status_code': frame['status_code'].to_numpy().astype(np.int16),
+        'age': frame['age'].to_numpy().astype(np.int8),
+    }
+    categories = {}
+    for column in CATEGORICAL_COLUMNS:
+        categories[column] = frame[column].cat.categories.tolist()
+        columns[column] = frame[column].cat.codes.to_numpy().astype(codes_dtype(len(categories[column])))
+    return columns, categories
+
+
+# function to read the first size bytes of a CSV log into typed columns and the categories of the coded columns
+def read_csv_columns(path, size):
+    with FilePrefix(path, size) as f:
+        frame = pd.read_csv(io.BufferedReader(f), dtype=CSV_DTYPES)
+    return columns_from_frame(frame)
+
+
+# function to read the CSV files of a log, as far as its source signature records, in chunks of at most
+# chunk_rows rows, as typed columns and the categories of the coded columns of each chunk
+def read_csv_chunks(path, signature, chunk_rows):
+    for file, size in signature_files(path, signature):
+        with FilePrefix(file, size) as f:
+            for frame in pd.read_csv(io.BufferedReader(f), dtype=CSV_DTYPES, chunksize=chunk_rows):
+                yield columns_from_frame(frame)
+
+
+# function to get the CSV files of a log: the log itself, or the shards of a log directory in the
+# order of its manifest (sorted file names when there is no manifest); raises ValueError for a
+# manifest that does not list the shards
+def log_files(path):
+    if not os.path.isdir(path):
+        return [path]
+    manifest_path = os.path.join(path, "manifest.json")
+    try:
+        with open(manifest_path) as f:
+            return [os.path.join(path, shard['file']) for shard in json.load(f)['shards']]
+    except OSError:
+        return sorted(glob.glob(os.path.join(path, "*.csv")))
+    except (ValueError, KeyError, TypeError) as error:
+        raise ValueError(f"malformed shard manifest {manifest_path}: {error!r}") from error
+
+
+# function to merge the columns of several shards, recoding each shard onto the union of the categories
+def merge_columns(shards):
+    categories = {column: sorted(set().union(*(shard_categories[column] for _, shard_categories in shards)))
+                  for column in CATEGORICAL_COLUMNS}
+    merged = {}
+    for name in shards[0][0]:
+        if name in categories:
+            dtype = codes_dtype(len(categories[name]))
+            parts = []
+            for shard_columns, shard_categories in shards:
+                # a trailing -1 keeps missing values (code -1) missing
+                recode = np.append(pd.Index(categories[name]).get_indexer(shard_categories[name]), -1).astype(dtype)
+                parts.append(recode[shard_columns[name]])
+            merged[name] = np.concatenate(parts)
+        else:
+            merged[name] = np.concatenate([shard_columns[name] for shard_columns, _ in shards])
+    return merged, categories
+
+
+# function to read a CSV log or a directory of CSV shards, as far as its source signature records, into
+# typed columns, parsing the shards in parallel processes
+def read_log_columns(path, signature):
+    files, sizes = zip(*signature_files(path, signature))
+    if len(files) == 1:
+        return read_csv_columns(files[0], sizes[0])
+    with ProcessPoolExecutor() as pool:
+        return merge_columns(list(pool.map(read_csv_columns, files, sizes)))
+
+
+# function to get the snapshot directory of a log
+def snapshot_path(path):
+    return path.rstrip("/" + os.sep) + ".snapshot"
+
+
+# function to get the modification signature of a log, the snapshot is rebuilt when it changes
+def source_signature(path):
+    signature = []
+    for file in log_files(path):
+        signature.append([os.path.basename(file), os.stat(file).st_mtime_ns, complete_size(file)])
+    return signature
+
+
+# function to get the files of the source signature of a log with the number of bytes recorded for each,
+# so a log appended to after its signature was taken is read only as far as the signature records
+def signature_files(path, signature):
+    directory = path if os.path.isdir(path) else os.path.dirname(path)
+    return [(os.path.join(directory, name), size) for name, _, size in signature]
+
+
+# function to read the manifest of a snapshot, returns None when it is missing or unreadable
+def read_manifest(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# function to convert a log into a snapshot directory holding one .npy file per column, with the sorted
+# index of the IP addresses stored next to the columns
+def write_snapshot(path, snapshot_dir):
+    signature = source_signature(path)
+    columns, categories = read_log_columns(path, signature)
+
+    # build next to the final location and swap it in, so concurrent workers never see a partial snapshot
+    build_dir = f"{snapshot_dir}.build-{os.getpid()}"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+    for name, values in columns.items():
+        np.save(os.path.join(build_dir, f"{name}.npy"), values)
+    ip_index = IpIndex.from_addresses(columns['ip_address'])
+    np.save(os.path.join(build_dir, "ip_index_addresses.npy"), ip_index.sorted_addresses)
+    np.save(os.path.join(build_dir, "ip_index_rows.npy"), ip_index.rows)
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'source': signature,
+        'num_rows': len(columns['time']),
+        'categories': categories,
+    }
+    with open(os.path.join(build_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    replace_directory(build_dir, snapshot_dir)
+
+
+# function to swap a directory built next to its final location into place; the target is a symlink to
+# a versioned directory, repointed with a single rename, so readers always find a complete directory
+def replace_directory(build_dir, target_dir):
+    version_dir = f"{target_dir}.v-{os.getpid()}-{time.time_ns()}"
+    os.rename(build_dir, version_dir)
+    link = f"{target_dir}.link-{os.getpid()}"
+    os.symlink(os.path.basename(version_dir), link)
+    old_dir = os.path.realpath(target_dir) if os.path.islink(target_dir) else None
+    if os.path.isdir(target_dir) and not os.path.islink(target_dir):
+        # a plain directory written before the versioned layout
+        shutil.rmtree(target_dir)
+    os.replace(link, target_dir)
+    if old_dir is not None:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+# function to build a frame from typed columns without copying them
+def frame_from_columns(columns, categories):
+    frame = {}
+    for name in FRAME_COLUMNS:
+        values = columns[name]
+        if name in categories:
+            values = pd.Categorical.from_codes(values, categories=categories[name], validate=False)
+        frame[name] = values
+    return pd.DataFrame(frame, copy=False)
+
+
+# function to memory-map a snapshot as a frame, with the source signature it was built from and its sorted
+# IP address index; numeric columns and category codes stay backed by the mapped files, so loading costs
+# no parsing and workers share the pages. All of them are read from one version of the snapshot, read
+# again when it is replaced meanwhile
+def read_snapshot(snapshot_dir):
+    while True:
+        version_dir = os.path.realpath(snapshot_dir)
+        try:
+            manifest = read_manifest(version_dir)
+            if manifest is None:
+                raise FileNotFoundError(f"no snapshot manifest in {version_dir}")
+            columns = {name: np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode='r')
+                       for name in FRAME_COLUMNS}
+            ip_index = IpIndex(np.load(os.path.join(version_dir, "ip_index_addresses.npy"), mmap_mode='r'),
+                               np.load(os.path.join(version_dir, "ip_index_rows.npy"), mmap_mode='r'))
+            return frame_from_columns(columns, manifest['categories']), manifest['source'], ip_index
+        except FileNotFoundError:
+            if os.path.realpath(snapshot_dir) == version_dir:
+                raise
+
+
+# function to get a hashable version of a log loaded from the given source signature, which changes
+# whenever any of its files does
+def dataset_version(path, source):
+    return (os.path.abspath(path), tuple(tuple(entry) for entry in source))
+
+
+# function to load a CSV log or a directory of CSV shards as one dataset, through its snapshot
+# which is rebuilt only when the log changes; returns the frame, the source signature it was
+# loaded from and its IP address index, all from the same version of the snapshot
+def load_data(path):
+    snapshot_dir = snapshot_path(path)
+    manifest = read_manifest(snapshot_dir)
+    if (manifest is None or manifest.get('format') != SNAPSHOT_FORMAT
+            or manifest.get('source') != source_signature(path)):
+        write_snapshot(path, snapshot_dir)
+    return read_snapshot(snapshot_dir)
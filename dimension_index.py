@@ -0,0 +1,47 @@
+import numpy as np
+
+
+# index of the country and continent dimensions of a log, built once from its distinct
+# (country, continent) pairs; answers which countries lie in the selected continents (and the
+# reverse) with dictionary lookups in O(selected) instead of scanning the rows
+class DimensionIndex:
+
+    def __init__(self, locations):
+        self.countries_of = {}
+        self.continents_of = {}
+        location_countries = []
+        location_continents = []
+        for country, continent in locations:
+            self.countries_of.setdefault(continent, []).append(country)
+            self.continents_of.setdefault(country, []).append(continent)
+            location_countries.append(country)
+            location_continents.append(continent)
+        self.countries = sorted(self.continents_of)
+        self.continents = sorted(self.countries_of)
+
+        # position of each location's country and continent in the sorted lists, to total
+        # per-location counts by country or by continent
+        self.location_countries = np.searchsorted(self.countries, location_countries)
+        self.location_continents = np.searchsorted(self.continents, location_continents)
+
+    # function to get the sorted countries of the selected continents (every country when none is selected)
+    def countries_in(self, selected_continents=None):
+        if not selected_continents:
+            return self.countries
+        return sorted({country for continent in selected_continents for country in self.countries_of.get(continent, ())})
+
+    # function to get the sorted continents of the selected countries (every continent when none is selected)
+    def continents_of_countries(self, selected_countries=None):
+        if not selected_countries:
+            return self.continents
+        return sorted({continent for country in selected_countries for continent in self.continents_of.get(country, ())})
+
+    # function to total counts given per location (in the order the index was built from) by country
+    def country_counts(self, location_counts):
+        totals = np.bincount(self.location_countries, weights=location_counts, minlength=len(self.countries))
+        return dict(zip(self.countries, totals.astype(np.int64).tolist()))
+
+    # function to total counts given per location (in the order the index was built from) by continent
+    def continent_counts(self, location_counts):
+        totals = np.bincount(self.location_continents, weights=location_counts, minlength=len(self.continents))
+        return dict(zip(self.continents, totals.astype(np.int64).tolist()))
@@ -1,14 +1,27 @@
+import argparse
+import json
+import os
 import random
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
+import numpy as np
+
+# first day and number of days of the games, the log covers every day
+start_date = "2024-07-26"
+num_days = 17
+
 # list of HTTP request methods
 request_methods = ["GET", "POST"]
 
 # list of HTTP status codes
 status_codes = [200, 304, 404, 500]
+status_code_weights = [0.6, 0.2, 0.1, 0.1]
 
 # list of user genders
 genders = ["Male", "Female", "Non-binary"]
+gender_weights = [0.6, 0.4, 0.1]
 
 # define income statuses
 income_statuses = ["Low", "Middle", "High"]
@@ -250,19 +263,25 @@ country_continent_mapping = {
 }
 
 
+# function to get the dates of the days of the log
+def log_dates(first_date=start_date, days=num_days):
+    first_day = datetime.strptime(first_date, "%Y-%m-%d")
+    return [(first_day + timedelta(days=day)).strftime("%Y-%m-%d") for day in range(days)]
+
+
 # function to generate simulated web server log entries
-def generate_log_data():
-    start_time = datetime.strptime("00:00:00", "%H:%M:%S")
-    end_time = datetime.strptime("23:59:59", "%H:%M:%S")
+def generate_log_data(dates=log_dates()):
+    start_time = datetime.strptime(random.choice(dates), "%Y-%m-%d")
+    end_time = start_time + timedelta(hours=23, minutes=59, seconds=59)
     random_time = start_time + timedelta(seconds=random.randint(0, int((end_time - start_time).total_seconds())))
-    timestamp = random_time.strftime("%H:%M:%S")
+    timestamp = random_time.strftime("%Y-%m-%d %H:%M:%S")
     ip_address = f"{random.randint(0,255)}.{random.randint(0,255)}.{random.randint(0,255)}.{random.randint(0,255)}"
     http_method = random.choice(request_methods)
     path = random.choice(paths)
-    status_code = random.choices(status_codes, weights=[0.6, 0.2, 0.1, 0.1])[0]
+    status_code = random.choices(status_codes, weights=status_code_weights)[0]
     country = random.choice(countries)
     continent = country_continent_mapping.get(country, "Unknown")  
-    gender = random.choices(genders, weights=[0.6, 0.4, 0.1])[0]
+    gender = random.choices(genders, weights=gender_weights)[0]
     age = random.randint(16, 80)
     income_status = random.choice(income_statuses)
 
@@ -270,16 +289,150 @@ def generate_log_data():
     return log_entry
 
 
+# header of the generated log file
+header = "time,ip_address,request_method,path,status_code,country,continent,gender,age,income_status"
+
+
 # function to generate a log file
-def generate_log_file(num_entries):
-    with open("fun_olympics.csv", "w") as f:
-        header = "time,ip_address,request_method,path,status_code,country,continent,gender,age,income_status"
+def generate_log_file(num_entries, output="fun_olympics.csv", dates=log_dates()):
+    with open(output, "w") as f:
         f.write(header + "\n")
         for _ in range(num_entries):
-            log_entry = generate_log_data()
+            log_entry = generate_log_data(dates)
             f.write(log_entry + "\n")
             print(log_entry)
 
 
-# generate a log file with 100000 entries
-generate_log_file(100000)
+# function to build a lookup table of the text of each value followed by a separator
+def lookup_table(values, separator=","):
+    return np.array([f"{value}{separator}" for value in values], dtype=object)
+
+
+# lookup tables for the batch mode, so whole columns are formatted by indexing instead of per-row
+# formatting; a country's entry also holds its continent, looked up through country_continent_mapping
+time_table = lookup_table(f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}"
+                          for second in range(24 * 60 * 60))
+octet_table = lookup_table(range(256), ".")
+last_octet_table = lookup_table(range(256))
+request_method_table = lookup_table(request_methods)
+path_table = lookup_table(paths)
+status_code_table = lookup_table(status_codes)
+country_table = lookup_table(f"{country},{country_continent_mapping.get(country, 'Unknown')}" for country in countries)
+gender_table = lookup_table(genders)
+age_table = lookup_table(range(81))
+income_status_table = lookup_table(income_statuses, "\n")
+
+
+# function to generate a batch of simulated log entries as whole columns drawn with a numpy Generator;
+# IPs are uint32 and every other text column (the date too) is an index into its list
+def generate_log_batch(rng, num_entries, days=num_days):
+    return {
+        'date': rng.integers(0, days, num_entries),
+        'time': rng.integers(0, 24 * 60 * 60, num_entries),
+        'ip_address': rng.integers(0, 2 ** 32, num_entries, dtype=np.uint32),
+        'request_method': rng.integers(0, len(request_methods), num_entries),
+        'path': rng.integers(0, len(paths), num_entries),
+        'status_code': rng.choice(len(status_codes), num_entries,
+                                  p=np.divide(status_code_weights, sum(status_code_weights))),
+        'country': rng.integers(0, len(countries), num_entries),
+        'gender': rng.choice(len(genders), num_entries, p=np.divide(gender_weights, sum(gender_weights))),
+        'age': rng.integers(16, 81, num_entries),
+        'income_status': rng.integers(0, len(income_statuses), num_entries),
+    }
+
+
+# function to format a batch of log entries as CSV lines, given the lookup table of the dates of the log
+def format_log_batch(batch, date_table):
+    ip_addresses = batch['ip_address']
+    lines = (date_table[batch['date']] + time_table[batch['time']]
+             + octet_table[ip_addresses >> 24] + octet_table[(ip_addresses >> 16) & 255]
+             + octet_table[(ip_addresses >> 8) & 255] + last_octet_table[ip_addresses & 255]
+             + request_method_table[batch['request_method']] + path_table[batch['path']]
+             + status_code_table[batch['status_code']] + country_table[batch['country']]
+             + gender_table[batch['gender']] + age_table[batch['age']]
+             + income_status_table[batch['income_status']])
+    return "".join(lines)
+
+
+# function to generate a log file in batch mode: columns are drawn with a seeded numpy Generator
+# and written in large chunks, without printing rows
+def generate_log_file_batch(num_entries, output="fun_olympics.csv", seed=None, chunk_size=1000000,
+                            dates=log_dates()):
+    rng = np.random.default_rng(seed)
+    date_table = lookup_table(dates, " ")
+    with open(output, "w") as f:
+        f.write(header + "\n")
+        for start in range(0, num_entries, chunk_size):
+            batch = generate_log_batch(rng, min(chunk_size, num_entries - start), len(dates))
+            f.write(format_log_batch(batch, date_table))
+
+
+# function to generate a log in parallel: the entries are split into shards written by a process pool,
+# each shard drawing from its own seed stream spawned from the given seed, so the log is reproducible
+# for a given seed and shard count; a manifest lists the shards of the output directory
+def generate_log_shards(num_entries, output_dir, num_shards, seed=None, chunk_size=1000000, workers=None,
+                        dates=log_dates()):
+    os.makedirs(output_dir, exist_ok=True)
+    shard_seeds = np.random.SeedSequence(seed).spawn(num_shards)
+    shard_sizes = [num_entries // num_shards + (shard < num_entries % num_shards) for shard in range(num_shards)]
+    shard_files = [f"part-{shard:05d}.csv" for shard in range(num_shards)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(generate_log_file_batch, shard_sizes,
+                      [os.path.join(output_dir, shard_file) for shard_file in shard_files],
+                      shard_seeds, [chunk_size] * num_shards, [dates] * num_shards))
+
+    manifest = {
+        'rows': num_entries,
+        'seed': seed,
+        'shards': [{'file': shard_file, 'rows': rows} for shard_file, rows in zip(shard_files, shard_sizes)],
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# function to concatenate the shards of a generated log into a single log file
+def concatenate_log_shards(output_dir, output):
+    with open(os.path.join(output_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    with open(output, "w") as out:
+        out.write(header + "\n")
+        for shard in manifest['shards']:
+            with open(os.path.join(output_dir, shard['file'])) as f:
+                f.readline()
+                shutil.copyfileobj(f, out)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a simulated FunOlympics web server log.")
+    parser.add_argument("--rows", type=int, default=100000, help="number of log entries to generate")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, for a reproducible log")
+    parser.add_argument("--start-date", default=start_date, help="first day of the log, as YYYY-MM-DD")
+    parser.add_argument("--days", type=int, default=num_days, help="number of days the log covers")
+    parser.add_argument("--batch", action="store_true",
+                        help="draw whole columns with NumPy and write them in chunks, without printing rows")
+    parser.add_argument("--chunk-size", type=int, default=1000000, help="rows per chunk in batch mode")
+    parser.add_argument("--output", default=None,
+                        help="path of the generated log file (default: fun_olympics.csv), or of the shard "
+                             "directory with --shards (default: fun_olympics)")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="split the log into this many shard files generated in parallel, in batch mode")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes generating shards (default: one per CPU)")
+    parser.add_argument("--concat", default=None, metavar="PATH",
+                        help="also concatenate the generated shards into a single log file at PATH")
+    args = parser.parse_args()
+    dates = log_dates(args.start_date, args.days)
+    output = args.output or ("fun_olympics" if args.shards else "fun_olympics.csv")
+
+    if args.shards:
+        generate_log_shards(args.rows, output, args.shards, seed=args.seed, chunk_size=args.chunk_size,
+                            workers=args.workers, dates=dates)
+        if args.concat:
+            concatenate_log_shards(output, args.concat)
+    elif args.batch:
+        generate_log_file_batch(args.rows, output, seed=args.seed, chunk_size=args.chunk_size, dates=dates)
+    else:
+        random.seed(args.seed)
+        generate_log_file(args.rows, output, dates)
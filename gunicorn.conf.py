@@ -0,0 +1,15 @@
+import gc
+
+# gunicorn settings for serving the dashboard, picked up by running `gunicorn` from this directory
+wsgi_app = "app:server"
+
+# load the log snapshot, indexes and count cube once in the master and fork the workers afterwards;
+# every column is a fixed-width NumPy array (the snapshot columns are memory-mapped, text columns
+# are dictionary codes) that is never written, so all workers share one physical copy of the data
+preload_app = True
+
+
+# function to freeze the objects of the preloaded app before the workers are forked, so the garbage
+# collector in the workers never writes to their headers and copies the pages holding them
+def when_ready(server):
+    gc.freeze()
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+
+# default number of counters of a heavy hitter summary
+DEFAULT_CAPACITY = 1000
+
+
+# mergeable Misra-Gries summary of the most frequent values of a stream, the counter-based dual of
+# Space-Saving: it keeps at most capacity counters, and whenever a batch brings more, the
+# (capacity + 1)-th largest count is subtracted from every counter and the emptied counters are dropped.
+# A kept count never exceeds the true count of its value, and falls short of it by at most the total
+# subtracted so far, which is at most weight / (capacity + 1) for a stream of the given weight; so every
+# value more frequent than that is kept, in memory bounded by the capacity whatever the stream length
+class HeavyHitters:
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.subtracted = 0
+        self.weight = 0
+
+    # function to add a batch of values of the stream
+    def add(self, values):
+        batch = pd.Series(values).value_counts(sort=False)
+        batch = batch[batch > 0]
+        batch.index = np.asarray(batch.index)
+        self.weight += int(batch.sum())
+
+        counts = pd.concat([self.counts, batch]).groupby(level=0, sort=False).sum() if len(self.counts) else batch
+        if len(counts) > self.capacity:
+            threshold = int(counts.nlargest(self.capacity + 1).iloc[-1])
+            counts = counts[counts > threshold] - threshold
+            self.subtracted += threshold
+        self.counts = counts.astype(np.int64)
+
+    # function to get the n most frequent values kept, with the guaranteed lower bound of their counts
+    # ('count') and the most they can have been undercounted ('error')
+    def top(self, n):
+        top = self.counts.nlargest(n)
+        return pd.DataFrame({'value': top.index, 'count': top.to_numpy(), 'error': self.subtracted})
+
+
+# heavy hitter summaries of the log traffic, for abuse detection: the IP addresses with the most requests,
+# and the paths with the most requests of each error status (4xx and 5xx)
+class TrafficSummary:
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.ip_addresses = HeavyHitters(capacity)
+        self.error_paths = {}
+
+    # function to add the rows of a log frame to the summaries
+    def add_frame(self, frame):
+        self.ip_addresses.add(frame['ip_address'].to_numpy())
+        status_codes = frame['status_code'].to_numpy()
+        errors = status_codes >= 400
+        for status_code in np.unique(status_codes[errors]).tolist():
+            paths = frame['path'][status_codes == status_code]
+            self.error_paths.setdefault(status_code, HeavyHitters(self.capacity)).add(paths)
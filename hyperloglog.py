@@ -0,0 +1,107 @@
+import numpy as np
+
+
+# default precision of the sketches: 2 ** 12 registers each, a standard error of about 1.6%
+DEFAULT_PRECISION = 12
+
+
+# function to hash 32-bit values (IP addresses) into 64 well mixed bits, with the splitmix64 mixer
+def hash_values(values):
+    hashes = values.astype(np.uint64) + np.uint64(0x9e3779b97f4a7c15)
+    hashes = (hashes ^ (hashes >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    hashes = (hashes ^ (hashes >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return hashes ^ (hashes >> np.uint64(31))
+
+
+# function to get the number of significant bits of 32-bit values, which float64 holds exactly
+def bit_lengths(values):
+    return np.frexp(values.astype(np.float64))[1]
+
+
+# function to split hashes into their register (the first precision bits) and their rank (the position
+# of the first one bit in the remaining bits)
+def registers_and_ranks(hashes, precision):
+    registers = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    high = (rest >> np.uint64(32)).astype(np.uint32)
+    low = (rest & np.uint64(0xffffffff)).astype(np.uint32)
+    lengths = np.where(high > 0, 32 + bit_lengths(high), bit_lengths(low))
+    return registers, (64 - precision - lengths + 1).astype(np.uint8)
+
+
+# function to estimate the distinct values counted by sets of registers (the last axis), with linear
+# counting for small counts; 64-bit hashes need no large range correction
+def estimate(registers):
+    num_registers = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / num_registers)
+    raw = alpha * num_registers ** 2 / np.exp2(-registers.astype(np.float64)).sum(axis=-1)
+    zeros = np.count_nonzero(registers == 0, axis=-1)
+    linear = num_registers * np.log(num_registers / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * num_registers) & (zeros > 0), linear, raw)
+
+
+# HyperLogLog sketches of the values of each cell of a grid, per day; the sketches are sparse, each
+# keeping only its non-zero registers as sorted keys (cell * registers + register) with their ranks, so
+# the many cells holding few values cost a few bytes per value instead of a full set of registers.
+# Sketches merge by taking the largest rank of each register, so the sketch of any set of cells is
+# built from theirs without the values
+class SketchGrid:
+
+    def __init__(self, shape, precision=DEFAULT_PRECISION):
+        self.shape = tuple(shape)
+        self.precision = precision
+        self.num_registers = 1 << precision
+        self.num_keys = int(np.prod(self.shape)) << precision
+        self.key_dtype = np.uint32 if self.num_keys <= 2 ** 32 else np.int64
+        self.entries = {}
+
+    # function to add values to the sketches of their days and cells (flat indexes into the grid)
+    def add(self, days, cells, values):
+        if not len(values):
+            return
+        registers, ranks = registers_and_ranks(hash_values(values), self.precision)
+        first_day = int(days.min())
+        keys = (days.astype(np.int64) - first_day) * self.num_keys + (cells.astype(np.int64) << self.precision) + registers
+        order = np.argsort(keys)
+        keys, ranks = keys[order], ranks[order]
+
+        # keep the largest rank of each day and key
+        starts = np.flatnonzero(np.append(True, keys[1:] != keys[:-1]))
+        keys, ranks = keys[starts], np.maximum.reduceat(ranks, starts)
+        days, keys = np.divmod(keys, self.num_keys)
+        day_starts = np.flatnonzero(np.append(True, days[1:] != days[:-1]))
+        for start, end in zip(day_starts, np.append(day_starts[1:], len(keys))):
+            self._add_day(first_day + int(days[start]), keys[start:end].astype(self.key_dtype), ranks[start:end])
+
+    # function to merge sorted unique keys and their ranks into the sketches of a day
+    def _add_day(self, day, keys, ranks):
+        if day not in self.entries:
+            self.entries[day] = (keys, ranks)
+            return
+        day_keys, day_ranks = self.entries[day]
+        positions = np.searchsorted(day_keys, keys)
+        found = day_keys[np.minimum(positions, len(day_keys) - 1)] == keys
+        np.maximum.at(day_ranks, positions[found], ranks[found])
+        self.entries[day] = (np.insert(day_keys, positions[~found], keys[~found]),
+                             np.insert(day_ranks, positions[~found], ranks[~found]))
+
+    # function to merge the sketches of the cells of the given days into registers per day and group:
+    # cell_groups maps each flat cell to its group, or to -1 to leave it out, and leading limits the
+    # read to the given positions along the first grid axis, whose cells are contiguous in the keys
+    def merge(self, days, cell_groups, num_groups, leading=None):
+        merged = np.zeros((len(days), num_groups, self.num_registers), dtype=np.uint8)
+        span = self.num_keys // self.shape[0]
+        for index, day in enumerate(days):
+            if day not in self.entries:
+                continue
+            keys, ranks = self.entries[day]
+            if leading is not None:
+                starts = np.searchsorted(keys, np.asarray(leading, dtype=np.int64) * span)
+                ends = np.searchsorted(keys, (np.asarray(leading, dtype=np.int64) + 1) * span)
+                keys = np.concatenate([keys[start:end] for start, end in zip(starts, ends)] + [keys[:0]])
+                ranks = np.concatenate([ranks[start:end] for start, end in zip(starts, ends)] + [ranks[:0]])
+            groups = cell_groups[keys >> self.precision]
+            selected = groups >= 0
+            np.maximum.at(merged[index], (groups[selected], keys[selected] & (self.num_registers - 1)),
+                          ranks[selected])
+        return merged
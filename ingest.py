@@ -0,0 +1,128 @@
+import io
+import logging
+import os
+import threading
+
+import pandas as pd
+
+from datastore import COLUMNS, CSV_DTYPES, columns_from_frame, frame_from_columns, merge_columns
+
+
+# default number of bytes read from the log per batch
+DEFAULT_BATCH_BYTES = 16 * 1024 * 1024
+
+
+# function to parse header-less CSV lines into typed columns and the categories of the coded columns;
+# lines with a wrong number of fields are dropped, returns None when no line is left. Raises ValueError
+# when a value of the remaining lines does not parse
+def parse_lines(lines):
+    frame = pd.read_csv(io.BytesIO(lines), header=None, names=COLUMNS, dtype=CSV_DTYPES, on_bad_lines='skip')
+    frame = frame[frame.notna().all(axis=1)]
+    if frame.empty:
+        return None
+    for column in frame.columns:
+        if isinstance(frame[column].dtype, pd.CategoricalDtype):
+            frame[column] = frame[column].cat.remove_unused_categories()
+    return columns_from_frame(frame)
+
+
+# tails a CSV log that is being appended to, returning the newly completed lines in batches;
+# the read offset survives truncation (reads restart at the top) and rotation (the old file is
+# drained before the new one at the same path is followed from its start)
+class LogTailer:
+
+    def __init__(self, path, offset=0, batch_bytes=DEFAULT_BATCH_BYTES):
+        self.path = path
+        self.batch_bytes = batch_bytes
+        self.file = open(path, "rb")
+        self.offset = offset
+        self.pending = b""
+        self.rows = 0
+        self.lock = threading.Lock()
+
+    # function to read a batch at an offset; positional reads keep the offset private to the
+    # process, since gunicorn workers forked after the tailer was opened share its file description
+    def _read_batch(self, offset):
+        if hasattr(os, "pread"):
+            return os.pread(self.file.fileno(), self.batch_bytes, offset)
+        self.file.seek(offset)
+        return self.file.read(self.batch_bytes)
+
+    # function to read the complete lines appended since the last read, up to one batch; returns the
+    # lines with the offset and the pending partial line to move to once they are parsed
+    def _read_lines(self):
+        offset, pending = self.offset, self.pending
+        if os.fstat(self.file.fileno()).st_size < offset:
+            # truncated in place, start again from the top
+            offset, pending = 0, b""
+
+        batch = self._read_batch(offset)
+        chunk = pending + batch
+        end = chunk.rfind(b"\n") + 1
+        return chunk[:end], offset + len(batch), chunk[end:]
+
+    # function to switch to a new file when the log was rotated, returns True when it did
+    def _follow_rotation(self):
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if current.st_ino == os.fstat(self.file.fileno()).st_ino:
+            return False
+        self.file.close()
+        self.file = open(self.path, "rb")
+        self.offset = 0
+        self.pending = b""
+        return True
+
+    # function to parse CSV lines into a log frame, skipping the header of a new or rewritten file;
+    # malformed lines are skipped and logged instead of failing the whole batch
+    def _parse(self, lines):
+        if lines.startswith(b"time,"):
+            lines = lines[lines.find(b"\n") + 1:]
+        if not lines:
+            return None
+        try:
+            parsed = [parse_lines(lines)]
+        except ValueError:
+            # some value does not parse, so parse the lines one at a time to skip just the bad ones
+            parsed = []
+            for line in lines.splitlines(keepends=True):
+                try:
+                    parsed.append(parse_lines(line))
+                except ValueError:
+                    pass
+        parsed = [shard for shard in parsed if shard is not None]
+        num_rows = sum(len(columns['time']) for columns, _ in parsed)
+        skipped = lines.count(b"\n") - num_rows
+        if skipped:
+            logging.warning("skipped %d malformed lines of the log %s", skipped, self.path)
+        if not num_rows:
+            return None
+        columns, categories = parsed[0] if len(parsed) == 1 else merge_columns(parsed)
+        return frame_from_columns(columns, categories)
+
+    # function to read every batch of new log rows, returns a list of frames; the read offset only
+    # moves past a batch once it is parsed, so a batch that fails is read again on the next poll
+    # and the batches parsed before it are still returned
+    def poll(self):
+        with self.lock:
+            batches = []
+            while True:
+                lines, offset, pending = self._read_lines()
+                if not lines:
+                    self.offset, self.pending = offset, pending
+                    # nothing left in this file, so it is safe to move on to a rotated one
+                    if self._follow_rotation():
+                        continue
+                    break
+                try:
+                    frame = self._parse(lines)
+                except Exception:
+                    logging.exception("failed to parse new rows of the log %s", self.path)
+                    break
+                self.offset, self.pending = offset, pending
+                if frame is not None:
+                    self.rows += len(frame)
+                    batches.append(frame)
+            return batches
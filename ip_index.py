@@ -0,0 +1,35 @@
+import ipaddress
+
+import numpy as np
+
+
+# function to parse an IPv4 address or CIDR block (e.g. "10.0.0.0/8") into the first and last of its
+# addresses as integers; raises ValueError when the text is neither
+def parse_cidr(text):
+    network = ipaddress.IPv4Network(text.strip(), strict=False)
+    return int(network.network_address), int(network.broadcast_address)
+
+
+# function to get the positions of the sorted IP addresses between first and last (inclusive), as a slice
+def address_range(sorted_addresses, first, last):
+    return slice(int(np.searchsorted(sorted_addresses, first, side='left')),
+                 int(np.searchsorted(sorted_addresses, last, side='right')))
+
+
+# sorted index of the IP address column of a log: the addresses in sorted order and the row of each,
+# so the rows of a network range are found with two binary searches instead of a scan of the column
+class IpIndex:
+
+    def __init__(self, sorted_addresses, rows):
+        self.sorted_addresses = sorted_addresses
+        self.rows = rows
+
+    # function to build the index of an IP address column
+    @classmethod
+    def from_addresses(cls, ip_addresses):
+        rows = np.argsort(ip_addresses, kind='stable').astype(np.uint32 if len(ip_addresses) < 2 ** 32 else np.int64)
+        return cls(ip_addresses[rows], rows)
+
+    # function to get the sorted row positions of the addresses between first and last (inclusive)
+    def rows_in(self, first, last):
+        return np.sort(self.rows[address_range(self.sorted_addresses, first, last)])
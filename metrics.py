@@ -0,0 +1,182 @@
+import bisect
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context
+
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+# upper bounds of the response size histogram buckets, in bytes
+SIZE_BUCKETS = [256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216]
+
+# logger of the callbacks slower than the slow request threshold
+slow_request_log = logging.getLogger("fun_olympics.slow_requests")
+
+
+# cumulative histogram in the Prometheus layout: one count per bucket upper bound, plus the sum and
+# the count of all observed values
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    # function to add an observed value
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# function to format Prometheus labels, e.g. {callback="update_total_requests"}
+def format_labels(names, values):
+    escaped = [str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values]
+    labels = ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+    return "{" + labels + "}" if labels else ""
+
+
+# per-callback instrumentation of the dashboard: each callback call records the time spent in each phase
+# (entered with phase() or timed(); time outside any phase counts as "other", and the time from the
+# callback returning to the response being ready counts as "serialize"), the log rows it scanned and the
+# size of its response; exposed in the Prometheus text format, per worker process
+class CallbackMetrics:
+
+    def __init__(self, slow_seconds=None):
+        self.slow_seconds = slow_seconds
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self.latency = {}
+        self.phase_latency = {}
+        self.response_bytes = {}
+        self.rows_scanned = {}
+        self.errors = {}
+
+    # context manager timing a phase of the running callback; nested phases are subtracted from the
+    # phases around them, so every second is counted once
+    @contextmanager
+    def phase(self, name):
+        record = getattr(self._local, "record", None)
+        if record is None:
+            yield
+            return
+        start = time.perf_counter()
+        record['nested'].append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            record['phases'][name] = record['phases'].get(name, 0.0) + elapsed - record['nested'].pop()
+            record['nested'][-1] += elapsed
+
+    # decorator timing every call of a function as a phase
+    def timed(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # function to add to the log rows scanned by the running callback
+    def add_rows_scanned(self, rows):
+        record = getattr(self._local, "record", None)
+        if record is not None:
+            record['rows_scanned'] += rows
+
+    # decorator instrumenting a callback; within a Flask request the record is finished by after_request
+    # once the response is serialized, otherwise (direct calls) as soon as the callback returns
+    def instrument(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            record = {'callback': func.__name__, 'arguments': args, 'start': time.perf_counter(), 'phases': {},
+                      'nested': [0.0], 'rows_scanned': 0}
+            self._local.record = record
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                with self.lock:
+                    key = (func.__name__, type(error).__name__)
+                    self.errors[key] = self.errors.get(key, 0) + 1
+                raise
+            finally:
+                self._local.record = None
+                record['end'] = time.perf_counter()
+                record['phases']['other'] = record['end'] - record['start'] - record['nested'][0]
+                if has_request_context():
+                    g.callback_metrics_record = record
+                else:
+                    self.finish(record, None)
+        return wrapper
+
+    # Flask after_request hook finishing the record of the callback of the request with its response
+    def after_request(self, response):
+        record = g.pop('callback_metrics_record', None)
+        if record is not None:
+            end = time.perf_counter()
+            record['phases']['serialize'] = end - record['end']
+            record['end'] = end
+            self.finish(record, None if response.is_streamed else response.calculate_content_length())
+        return response
+
+    # function to add a finished callback call to the metrics, and to the slow request log when it is slow
+    def finish(self, record, response_bytes):
+        callback = record['callback']
+        total = record['end'] - record['start']
+        with self.lock:
+            self.latency.setdefault((callback,), Histogram(LATENCY_BUCKETS)).observe(total)
+            for phase, seconds in record['phases'].items():
+                self.phase_latency.setdefault((callback, phase), Histogram(LATENCY_BUCKETS)).observe(seconds)
+            if response_bytes is not None:
+                self.response_bytes.setdefault((callback,), Histogram(SIZE_BUCKETS)).observe(response_bytes)
+            self.rows_scanned[(callback,)] = self.rows_scanned.get((callback,), 0) + record['rows_scanned']
+
+        if self.slow_seconds is not None and total >= self.slow_seconds:
+            phases = ", ".join(f"{phase} {seconds * 1000:.1f} ms" for phase, seconds in record['phases'].items())
+            slow_request_log.warning("slow callback %s took %.1f ms for filters %r (%s; %d rows scanned)",
+                                     callback, total * 1000, record['arguments'], phases, record['rows_scanned'])
+
+    # function to render the metrics in the Prometheus text exposition format
+    def exposition(self):
+        lines = []
+
+        def histograms(name, help_text, label_names, histograms_by_labels):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(histograms_by_labels.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{format_labels(label_names + ['le'], labels + (bound,))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(label_names, labels)} {histogram.sum}")
+                lines.append(f"{name}_count{format_labels(label_names, labels)} {histogram.count}")
+
+        def counters(name, help_text, label_names, counts_by_labels):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, count in sorted(counts_by_labels.items()):
+                lines.append(f"{name}{format_labels(label_names, labels)} {count}")
+
+        with self.lock:
+            histograms("fun_olympics_callback_seconds", "Wall time of a dashboard callback, including serialization.",
+                       ['callback'], self.latency)
+            histograms("fun_olympics_callback_phase_seconds", "Wall time of a phase of a dashboard callback.",
+                       ['callback', 'phase'], self.phase_latency)
+            histograms("fun_olympics_callback_response_bytes", "Size of the response of a dashboard callback.",
+                       ['callback'], self.response_bytes)
+            counters("fun_olympics_callback_rows_scanned_total", "Log rows scanned by a dashboard callback.",
+                     ['callback'], self.rows_scanned)
+            counters("fun_olympics_callback_errors_total", "Exceptions raised by a dashboard callback.",
+                     ['callback', 'exception'], self.errors)
+        return "\n".join(lines) + "\n"
+
+    # Flask view serving the metrics
+    def metrics_view(self):
+        return Response(self.exposition(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,168 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+from cube import NO_SPORTING_EVENT
+from datastore import (CATEGORICAL_COLUMNS, frame_from_columns, read_csv_chunks, read_manifest, replace_directory,
+                       source_signature)
+from ip_index import address_range
+
+
+# layout version of the partitions, bump it whenever the stored records change
+PARTITIONS_FORMAT = 4
+
+# default number of rows read, partitioned and aggregated at a time
+DEFAULT_CHUNK_ROWS = 1000000
+
+# fixed-width record of a log row in the partition files; text columns are stored as codes into the
+# categories of the manifest
+RECORD_DTYPE = np.dtype([('date', np.int32), ('time', np.int32), ('ip_address', np.uint32), ('status_code', np.int16), ('age', np.int8)]
+                        + [(column, np.int32) for column in CATEGORICAL_COLUMNS])
+
+
+# function to get the partition directory of a log
+def partitions_path(path):
+    return path.rstrip("/" + os.sep) + ".partitions"
+
+
+# function to recode the coded columns of a chunk onto categories shared by all chunks, adding the
+# values not seen before to the end of the shared categories
+def recode_chunk(columns, chunk_categories, categories, codes_of):
+    for column in CATEGORICAL_COLUMNS:
+        for value in chunk_categories[column]:
+            if value not in codes_of[column]:
+                codes_of[column][value] = len(categories[column])
+                categories[column].append(value)
+        # a trailing -1 keeps missing values (code -1) missing
+        recode = np.array([codes_of[column][value] for value in chunk_categories[column]] + [-1], dtype=np.int32)
+        columns[column] = recode[columns[column]]
+    return columns
+
+
+# function to convert a CSV log into a directory of partitions, one file of fixed-width records per
+# day, sporting event and hour of the day, sorted by IP address; the log is read in chunks, so memory is
+# bounded by the chunk size (and the size of the largest partition)
+def write_partitions(path, partition_dir, derive, chunk_rows=DEFAULT_CHUNK_ROWS):
+    signature = source_signature(path)
+    build_dir = f"{partition_dir}.build-{os.getpid()}"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+
+    categories = {column: [] for column in CATEGORICAL_COLUMNS}
+    codes_of = {column: {} for column in CATEGORICAL_COLUMNS}
+    locations = set()
+    ages = []
+    partitions = {}
+    num_rows = 0
+    for columns, chunk_categories in read_csv_chunks(path, signature, chunk_rows):
+        columns = recode_chunk(columns, chunk_categories, categories, codes_of)
+        frame = derive(frame_from_columns(columns, categories))
+        locations.update(frame[['country', 'continent']].drop_duplicates().itertuples(index=False, name=None))
+        if len(frame):
+            ages = [int(min(ages + [columns['age'].min()])), int(max(ages + [columns['age'].max()]))]
+
+        events = frame['sporting_event'].cat.categories.tolist() + [NO_SPORTING_EVENT]
+        event_codes = frame['sporting_event'].cat.codes.to_numpy().astype(np.int64)
+        event_codes[event_codes < 0] = len(events) - 1
+        keys = (columns['date'].astype(np.int64) * len(events) + event_codes) * 24 + columns['time'] // 3600
+
+        records = np.empty(len(frame), dtype=RECORD_DTYPE)
+        for name in RECORD_DTYPE.names:
+            records[name] = columns[name]
+        order = np.argsort(keys, kind='stable')
+        records, keys = records[order], keys[order]
+
+        # append the rows of each partition to its file
+        partition_keys, starts = np.unique(keys, return_index=True)
+        for key, start, end in zip(partition_keys.tolist(), starts, np.append(starts[1:], len(keys))):
+            day_event, hour = divmod(key, 24)
+            day, event = divmod(day_event, len(events))
+            partition = partitions.setdefault((day, events[event], hour), {
+                'date': day,
+                'sporting_event': events[event],
+                'hour': hour,
+                'file': f"{len(partitions):04d}.bin",
+                'rows': 0,
+            })
+            with open(os.path.join(build_dir, partition['file']), "ab") as f:
+                records[start:end].tofile(f)
+            partition['rows'] += int(end - start)
+        num_rows += len(frame)
+
+    # sort the rows of each partition by IP address, so the rows of a network range are found by binary search
+    for partition in partitions.values():
+        file = os.path.join(build_dir, partition['file'])
+        records = np.fromfile(file, dtype=RECORD_DTYPE)
+        records[np.argsort(records['ip_address'], kind='stable')].tofile(file)
+
+    manifest = {
+        'format': PARTITIONS_FORMAT,
+        'source': signature,
+        'num_rows': num_rows,
+        'categories': categories,
+        'locations': sorted(locations),
+        'ages': ages,
+        'partitions': sorted(partitions.values(),
+                             key=lambda partition: (partition['date'], partition['sporting_event'], partition['hour'])),
+    }
+    with open(os.path.join(build_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    replace_directory(build_dir, partition_dir)
+
+
+# log stored on disk as partitions keyed by day, sporting event and hour, read back as a stream of frames
+# of bounded size instead of being loaded whole
+class PartitionedLog:
+
+    def __init__(self, partition_dir, derive):
+        # the version the partitions link to now, so every later read comes from the same one
+        self.directory = os.path.realpath(partition_dir)
+        self.derive = derive
+        manifest = read_manifest(self.directory)
+        self.source = manifest['source']
+        self.num_rows = manifest['num_rows']
+        self.categories = manifest['categories']
+        self.locations = [tuple(location) for location in manifest['locations']]
+        youngest, oldest = manifest['ages'] or [0, -1]
+        self.ages = np.arange(youngest, oldest + 1)
+        self.partitions = manifest['partitions']
+
+    # function to read partitions as log frames of at most chunk_rows rows with the derived columns added;
+    # small partitions are read together, large ones in several chunks. Given a (first, last) range of IP
+    # addresses, only the rows within it are read, found by binary search in each partition
+    def chunks(self, partitions, chunk_rows=DEFAULT_CHUNK_ROWS, ip_range=None):
+        blocks = []
+        buffered = 0
+        for partition in partitions:
+            records = np.memmap(os.path.join(self.directory, partition['file']), dtype=RECORD_DTYPE, mode='r')
+            if ip_range is not None:
+                records = records[address_range(records['ip_address'], *ip_range)]
+            start = 0
+            while start < len(records):
+                block = records[start:start + chunk_rows - buffered]
+                start += len(block)
+                blocks.append(block)
+                buffered += len(block)
+                if buffered == chunk_rows:
+                    yield self._frame(blocks)
+                    blocks, buffered = [], 0
+        if blocks:
+            yield self._frame(blocks)
+
+    # function to build a log frame from blocks of records
+    def _frame(self, blocks):
+        records = np.concatenate(blocks)
+        columns = {name: records[name] for name in RECORD_DTYPE.names}
+        return self.derive(frame_from_columns(columns, self.categories))
+
+
+# function to open the partitions of a log, which are rebuilt only when the log changes
+def load_partitions(path, derive, chunk_rows=DEFAULT_CHUNK_ROWS):
+    partition_dir = partitions_path(path)
+    manifest = read_manifest(partition_dir)
+    if (manifest is None or manifest.get('format') != PARTITIONS_FORMAT
+            or manifest.get('source') != source_signature(path)):
+        write_partitions(path, partition_dir, derive, chunk_rows)
+    return PartitionedLog(partition_dir, derive)
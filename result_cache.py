@@ -0,0 +1,124 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+
+# default memory cap of the cache, in bytes
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# seconds a hit may leave the last use time of an entry unchanged; the LRU order only needs to be
+# this coarse, and a hit that writes takes the write lock of the whole database
+LAST_USED_RESOLUTION = 60
+
+
+# function to get the cache directory of a log, kept next to it like its snapshot
+def cache_path(path):
+    return path.rstrip("/" + os.sep) + ".cache"
+
+
+# function to create a directory private to the current user, or check that an existing one is; the
+# caches hold pickles, which run code when they are loaded, so no other user may be able to write them
+def private_directory(path):
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    status = os.stat(path)
+    if hasattr(os, "getuid") and (status.st_uid != os.getuid() or status.st_mode & 0o077):
+        raise PermissionError(f"cache directory {path} must be owned by the server user with mode 0700")
+    return path
+
+
+# LRU cache of filter results kept in an on-disk SQLite database, so every callback
+# and every gunicorn worker on the host shares the same entries
+class ResultCache:
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        private_directory(os.path.dirname(os.path.abspath(path)))
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+        conn = self._connect()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS results ("
+                         "key TEXT PRIMARY KEY, "
+                         "value BLOB NOT NULL, "
+                         "size INTEGER NOT NULL, "
+                         "last_used REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+
+    # sqlite connections cannot be shared between threads or carried across a fork (gunicorn
+    # --preload forks the workers after the cache was opened), so keep one per thread and process
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # function to look up a cached value, returns None on a miss; the last use time is only written
+    # when it is older than LAST_USED_RESOLUTION, so most hits are reads only
+    def get(self, key):
+        key = repr(key)
+        conn = self._connect()
+        row = conn.execute("SELECT value, last_used FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > LAST_USED_RESOLUTION:
+            with conn:
+                conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+        return pickle.loads(row[0])
+
+    # function to store a value and evict least recently used entries above the memory cap
+    def set(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                         (repr(key), blob, len(blob), time.time()))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, size in conn.execute("SELECT key, size FROM results ORDER BY last_used").fetchall():
+                    conn.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                    total -= size
+                    if total <= self.max_bytes:
+                        break
+
+    # function to return a cached value, computing and storing it on a miss; concurrent
+    # requests for the same key within a worker wait for the first computation. A key only
+    # has a lock while it is being computed, with the number of requests holding or waiting for it
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        lock_key = repr(key)
+        with self._locks_guard:
+            entry = self._locks.setdefault(lock_key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                value = self.get(key)
+                if value is None:
+                    value = compute()
+                    self.set(key, value)
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[lock_key]
+        return value
+
+    # function to drop every cached entry
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM results")
@@ -0,0 +1,85 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# the dashboard modules live at the top of the repository, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# random generator of a test, seeded so every run draws the same values
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+# factory of IP addresses as the rows of a log have them: num_rows draws from num_distinct addresses
+@pytest.fixture
+def draw_addresses(rng):
+    def draw(num_rows, num_distinct):
+        return rng.choice(rng.integers(0, 2 ** 32, num_distinct, dtype=np.uint32), num_rows)
+    return draw
+
+
+# factory of a skewed stream of values, a few heavy ones over a long tail
+@pytest.fixture
+def draw_stream(rng):
+    def draw(num_values):
+        return rng.zipf(1.3, num_values) % 100000
+    return draw
+
+
+# factory of viewer ages and their counts per consecutive age, as the cube keeps them; returns the ages,
+# the age axis and the counts
+@pytest.fixture
+def draw_ages(rng):
+    def draw(youngest=16, oldest=80):
+        ages = rng.integers(youngest, oldest + 1, 5000)
+        axis = np.arange(youngest, oldest + 1)
+        return ages, axis, np.bincount(ages - youngest, minlength=len(axis))
+    return draw
+
+
+# factory of per-minute visit counts
+@pytest.fixture
+def draw_minute_counts(rng):
+    def draw(num_minutes, mean=3):
+        return rng.poisson(mean, num_minutes)
+    return draw
+
+
+# factory of a log frame as the cube reads it, over the given day numbers: dates, times as seconds since midnight,
+# IP addresses and a few values of each dimension
+@pytest.fixture
+def draw_log_frame(rng, draw_addresses):
+    def draw(num_rows, days):
+        locations = pd.DataFrame([("France", "Europe"), ("Japan", "Asia"), ("Kenya", "Africa"), ("Spain", "Europe")],
+                                 columns=['country', 'continent']).iloc[rng.integers(0, 4, num_rows)]
+        return pd.DataFrame({
+            'date': rng.choice(days, num_rows).astype(np.int32),
+            'time': rng.integers(0, 24 * 3600, num_rows).astype(np.int32),
+            'ip_address': draw_addresses(num_rows, num_rows // 2),
+            'sporting_event': rng.choice(["Diving", "Rowing", "Tennis", "Other"], num_rows),
+            'country': locations['country'].to_numpy(),
+            'continent': locations['continent'].to_numpy(),
+            'age': rng.integers(16, 81, num_rows),
+            'gender': rng.choice(["Female", "Male"], num_rows),
+            'income_status': rng.choice(["High", "Low", "Middle"], num_rows),
+        })
+    return draw
+
+
+# factory of CSV log lines, after the header of a log when asked, the age of each line counting up from
+# first_age so the rows read back can be matched to the lines
+@pytest.fixture
+def draw_log_lines(rng):
+    def draw(num_lines, first_age=16, header=False):
+        lines = "".join(f"2024-07-{rng.integers(26, 29)} {rng.integers(0, 24):02d}:{rng.integers(0, 60):02d}:00,"
+                        f"10.0.{rng.integers(0, 256)}.{rng.integers(0, 256)},GET,/tennis,200,France,Europe,Female,"
+                        f"{first_age + line},High\n" for line in range(num_lines))
+        if header:
+            lines = "time,ip_address,request_method,path,status_code,country,continent,gender,age,income_status\n" + lines
+        return lines
+    return draw
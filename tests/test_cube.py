@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import (DEFAULT_AGE_EDGES, MINUTES_PER_DAY, CountCube, age_histogram, minute_prefix_sums, peak_windows,
+                  window_counts)
+
+
+# sporting events of the cubes, the rows of other events fall outside them
+SPORTING_EVENTS = ["Diving", "Rowing", "Tennis"]
+
+
+# the default bins are the age groups, the last one open to the oldest age, with the counts pandas bins
+def test_age_histogram_default_edges(draw_ages):
+    ages, axis, counts = draw_ages()
+    labels, binned = age_histogram(axis, counts, axis[0], axis[-1], DEFAULT_AGE_EDGES)
+
+    assert labels == ["16-24", "25-34", "35-44", "45-54", "55-64", "65+"]
+    expected = pd.cut(pd.Series(ages), [axis[0] - 1] + DEFAULT_AGE_EDGES + [axis[-1]]).value_counts(sort=False)
+    assert binned.tolist() == expected.tolist()
+
+
+# within an age range, the bins are clipped to the range and edges outside it are ignored
+@pytest.mark.parametrize("first, last, edges, labels", [
+    (20, 60, DEFAULT_AGE_EDGES, ["20-24", "25-34", "35-44", "45-54", "55-60"]),
+    (30, 30, DEFAULT_AGE_EDGES, ["30"]),
+    (30, 80, [10, 30, 31, 90], ["30", "31", "32+"]),
+    (16, 80, [], ["16+"]),
+    (70, 80, [24, 34], ["70+"]),
+])
+def test_age_histogram_range(draw_ages, first, last, edges, labels):
+    ages, axis, counts = draw_ages()
+    got_labels, binned = age_histogram(axis, counts, first, last, edges)
+
+    assert got_labels == labels
+    bins = [first - 1] + [edge for edge in sorted(edges) if first <= edge < last] + [last]
+    expected = pd.cut(pd.Series(ages[(ages >= first) & (ages <= last)]), bins).value_counts(sort=False)
+    assert binned.tolist() == expected.tolist()
+
+
+# a range past the ages of the viewers, or a cube without ages, counts no visits
+def test_age_histogram_outside_ages(draw_ages):
+    _, axis, counts = draw_ages(youngest=20, oldest=30)
+    labels, binned = age_histogram(axis, counts, 40, 60, [50])
+    assert labels == ["40-50", "51-60"]
+    assert binned.tolist() == [0, 0]
+
+    labels, binned = age_histogram(np.arange(0), np.zeros(0, dtype=np.int64), 16, 80, DEFAULT_AGE_EDGES)
+    assert binned.tolist() == [0] * 6
+
+
+# function to find the busiest non-overlapping windows by brute force: the rolling sums of pandas, taking the
+# busiest allowed window and dropping every window overlapping it
+def brute_force_peaks(counts, width, k, allowed=None):
+    sums = pd.Series(counts).rolling(width).sum().to_numpy()[width - 1:]
+    if allowed is not None:
+        sums[~allowed] = -1
+    peaks = []
+    while len(peaks) < k and sums.max() > 0:
+        start = int(np.argmax(sums))
+        peaks.append((start, int(sums[start])))
+        sums[max(start - width + 1, 0):start + width] = -1
+    return peaks
+
+
+# the peaks are the busiest windows pandas finds, and no two of them overlap
+@pytest.mark.parametrize("width", [1, 5, 15, 60])
+def test_peak_windows(draw_minute_counts, width):
+    counts = draw_minute_counts(3 * 1440)
+    peaks = peak_windows(counts, width, 3)
+
+    assert peaks == brute_force_peaks(counts, width, 3)
+    for start, visits in peaks:
+        assert visits == counts[start:start + width].sum()
+    starts = sorted(start for start, _ in peaks)
+    assert all(later - earlier >= width for earlier, later in zip(starts, starts[1:]))
+
+
+# only the allowed starts are taken, here the windows lying within 00:00-00:30 of each day
+def test_peak_windows_allowed(draw_minute_counts):
+    counts = draw_minute_counts(2 * 1440)
+    width = 10
+    start_minutes = np.arange(len(counts) - width + 1) % 1440
+    allowed = start_minutes + width <= 30
+    peaks = peak_windows(counts, width, 3, allowed)
+
+    assert peaks == brute_force_peaks(counts, width, 3, allowed)
+    assert all(start % 1440 + width <= 30 for start, _ in peaks)
+
+
+# fewer windows than asked are returned when the visits run out, none for an empty selection
+def test_peak_windows_sparse():
+    counts = np.zeros(1440, dtype=np.int64)
+    counts[[100, 700]] = [4, 9]
+    assert peak_windows(counts, 60, 3) == [(641, 9), (41, 4)]
+    assert peak_windows(np.zeros(1440, dtype=np.int64), 60, 3) == []
+    assert peak_windows(np.zeros(0, dtype=np.int64), 60, 3) == []
+
+
+# function to count the rows of a frame per sporting event of a cube and minute of the consecutive days from first
+# to last, by brute force
+def brute_force_minutes(cube, frame, first, last):
+    events = pd.Categorical(frame['sporting_event'], categories=cube.sporting_events[:-1]).codes.astype(np.int64)
+    events[events < 0] = len(cube.sporting_events) - 1
+    minutes = (frame['date'].to_numpy() - first) * MINUTES_PER_DAY + frame['time'].to_numpy() // 60
+    counts = np.zeros((len(cube.sporting_events), (last - first + 1) * MINUTES_PER_DAY), dtype=np.int64)
+    np.add.at(counts, (events, minutes), 1)
+    return counts
+
+
+# the per-minute counts of a country filter (from the sparse counts of its locations) and of any other filter (from
+# the dense counts per continent) are those of the rows, at any resolution; the days without rows count zero
+@pytest.mark.parametrize("countries, continents", [
+    (None, None),
+    (["France", "Kenya"], None),
+    (None, ["Europe"]),
+    (["France"], ["Asia"]),
+])
+def test_sum_minutes(draw_log_frame, countries, continents):
+    frame = draw_log_frame(20000, [19930, 19932])
+    cube = CountCube.from_frame(frame, SPORTING_EVENTS)
+    counts = cube.sum_minutes(1, None, countries, continents, (19930, 19932))
+
+    selected = frame[frame['country'].isin(countries or frame['country'])
+                     & frame['continent'].isin(continents or frame['continent'])]
+    np.testing.assert_array_equal(counts, brute_force_minutes(cube, selected, 19930, 19932))
+    np.testing.assert_array_equal(cube.sum_minutes(15, None, countries, continents, (19930, 19932)),
+                                  counts.reshape(len(cube.sporting_events), -1, 15).sum(axis=2))
+
+
+# a date range without any day of the log selects no minutes, and the prefix sums and window counts of them are
+# empty
+@pytest.mark.parametrize("countries", [None, ["France"]])
+def test_sum_minutes_empty_days(draw_log_frame, countries):
+    frame = draw_log_frame(1000, [19930, 19931])
+    cube = CountCube.from_frame(frame, SPORTING_EVENTS)
+
+    for resolution in [1, 15]:
+        assert cube.sum_minutes(resolution, None, countries, None, (19940, 19945)).shape == (4, 0)
+    prefix_sums = minute_prefix_sums(cube.sum_minutes(1, None, countries, None, (19940, 19945)))
+    assert prefix_sums.shape == (4, 0, MINUTES_PER_DAY + 1)
+    assert window_counts(prefix_sums, np.arange(0, MINUTES_PER_DAY + 1, 60), 60, 600).shape == (4, 0, 24)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from heavy_hitters import HeavyHitters, TrafficSummary
+
+
+# the kept counts never exceed the true counts and fall short by at most the subtracted total, which is
+# at most N / (capacity + 1); every value more frequent than that is kept
+@pytest.mark.parametrize("capacity", [10, 100, 1000])
+def test_misra_gries_bounds(draw_stream, capacity):
+    stream = draw_stream(200000)
+    summary = HeavyHitters(capacity)
+    for batch in np.array_split(stream, 17):
+        summary.add(batch)
+
+    exact = pd.Series(stream).value_counts()
+    assert summary.weight == len(stream)
+    assert len(summary.counts) <= capacity
+    assert summary.subtracted <= len(stream) / (capacity + 1)
+    kept = exact[summary.counts.index]
+    assert (summary.counts <= kept).all()
+    assert (summary.counts >= kept - summary.subtracted).all()
+    assert set(exact[exact > len(stream) / (capacity + 1)].index) <= set(summary.counts.index)
+
+
+# a stream with no more distinct values than counters is counted exactly
+def test_exact_below_capacity(draw_stream):
+    stream = draw_stream(5000) % 50
+    summary = HeavyHitters(50)
+    summary.add(stream[:2000])
+    summary.add(stream[2000:])
+
+    exact = pd.Series(stream).value_counts()
+    assert summary.subtracted == 0
+    pd.testing.assert_series_equal(summary.counts.sort_index(), exact.sort_index(), check_names=False,
+                                   check_index_type=False)
+    top = summary.top(5)
+    assert top['count'].tolist() == exact.nlargest(5).tolist()
+    assert (top['error'] == 0).all()
+
+
+# an empty summary, or an empty batch, has no heavy hitters
+def test_empty_stream():
+    summary = HeavyHitters(10)
+    summary.add(np.array([], dtype=np.uint32))
+    assert summary.weight == 0
+    assert summary.top(5).empty
+
+
+# the traffic summary keeps the paths of each error status apart, and leaves out the other statuses
+def test_traffic_summary_error_paths(rng):
+    frame = pd.DataFrame({
+        'ip_address': rng.integers(0, 50, 3000).astype(np.uint32),
+        'status_code': rng.choice([200, 301, 404, 500], 3000),
+        'path': pd.Categorical(rng.choice(['/a', '/b', '/c', '/d'], 3000)),
+    })
+    summary = TrafficSummary(capacity=100)
+    summary.add_frame(frame.iloc[:1000])
+    summary.add_frame(frame.iloc[1000:])
+
+    assert sorted(summary.error_paths) == [404, 500]
+    exact = frame[frame['status_code'] >= 400].groupby(['status_code', 'path'], observed=True).size()
+    for status_code, paths in summary.error_paths.items():
+        assert paths.counts.sort_index().to_dict() == exact[status_code].to_dict()
+    assert summary.ip_addresses.counts.sort_index().to_dict() == frame['ip_address'].value_counts().sort_index().to_dict()
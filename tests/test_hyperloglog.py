@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hyperloglog import DEFAULT_PRECISION, SketchGrid, estimate
+
+
+# relative standard error of a sketch of the default precision
+STANDARD_ERROR = 1.04 / np.sqrt(1 << DEFAULT_PRECISION)
+
+
+# function to estimate the distinct values of the cells of a grid, merged into one group per day
+def merged_estimate(grid, days):
+    cell_groups = np.zeros(int(np.prod(grid.shape)), dtype=np.int64)
+    return estimate(grid.merge(days, cell_groups, 1))[:, 0]
+
+
+# the estimate of a sketch stays within four standard errors of the exact distinct count
+@pytest.mark.parametrize("num_distinct", [10, 1000, 50000, 300000])
+def test_estimate_within_error_bound(draw_addresses, num_distinct):
+    addresses = draw_addresses(2 * num_distinct, num_distinct)
+    grid = SketchGrid((1,))
+    grid.add(np.zeros(len(addresses), dtype=np.int64), np.zeros(len(addresses), dtype=np.int64), addresses)
+
+    exact = pd.Series(addresses).nunique()
+    assert abs(merged_estimate(grid, [0])[0] - exact) <= 4 * STANDARD_ERROR * exact
+
+
+# merging the sketches of several cells and batches gives the registers of a single sketch of all values
+def test_merge_matches_single_sketch(draw_addresses):
+    addresses = draw_addresses(20000, 5000)
+    cells = addresses % 6
+    split = SketchGrid((2, 3))
+    for batch in np.array_split(np.arange(len(addresses)), 4):
+        split.add(np.full(len(batch), 7), cells[batch], addresses[batch])
+    single = SketchGrid((2, 3))
+    single.add(np.full(len(addresses), 7), np.zeros(len(addresses), dtype=np.int64), addresses)
+
+    cell_groups = np.zeros(6, dtype=np.int64)
+    np.testing.assert_array_equal(split.merge([7], cell_groups, 1), single.merge([7], cell_groups, 1))
+
+
+# the sketches of each day count the values of that day only, and a day without values estimates zero
+def test_days_are_separate(draw_addresses):
+    addresses = draw_addresses(30000, 20000)
+    days = np.repeat([100, 102], 15000)
+    grid = SketchGrid((1,))
+    grid.add(days, np.zeros(len(addresses), dtype=np.int64), addresses)
+
+    estimates = merged_estimate(grid, [100, 101, 102])
+    exact = pd.DataFrame({'day': days, 'address': addresses}).groupby('day')['address'].nunique()
+    assert estimates[1] == 0
+    for estimated, day in zip(estimates[[0, 2]], [100, 102]):
+        assert abs(estimated - exact[day]) <= 4 * STANDARD_ERROR * exact[day]
+
+
+# an empty selection of days or cells estimates no viewers
+def test_empty_selection(draw_addresses):
+    addresses = draw_addresses(1000, 500)
+    grid = SketchGrid((2,))
+    grid.add(np.zeros(len(addresses), dtype=np.int64), addresses % 2, addresses)
+
+    assert grid.merge([], np.zeros(2, dtype=np.int64), 1).shape == (0, 1, 1 << DEFAULT_PRECISION)
+    assert merged_estimate(grid, [5]).tolist() == [0]
+    assert estimate(grid.merge([0], np.full(2, -1), 1)).tolist() == [[0]]
+
+
+# a leading selection reads only the given positions of the first grid axis
+def test_merge_leading_selection(draw_addresses):
+    addresses = draw_addresses(20000, 8000)
+    events = addresses % 4
+    grid = SketchGrid((4, 2))
+    grid.add(np.zeros(len(addresses), dtype=np.int64), events * 2 + addresses % 2, addresses)
+
+    cell_groups = np.zeros(8, dtype=np.int64)
+    leading = grid.merge([0], cell_groups, 1, leading=[1, 3])
+    masked = grid.merge([0], np.where(np.isin(np.arange(8) // 2, [1, 3]), 0, -1), 1)
+    np.testing.assert_array_equal(leading, masked)
@@ -0,0 +1,73 @@
+import logging
+import os
+
+import pandas as pd
+
+from ingest import LogTailer
+
+
+# function to get the ages of the rows of the frames a poll returns, in order
+def polled_ages(tailer):
+    frames = tailer.poll()
+    return pd.concat(frames)['age'].tolist() if frames else []
+
+
+# appended lines are returned once complete, skipping the header, and the tail starts at the given offset
+def test_poll_appended_lines(tmp_path, draw_log_lines):
+    path = tmp_path / "log.csv"
+    path.write_text(draw_log_lines(3, header=True))
+    assert polled_ages(LogTailer(str(path))) == [16, 17, 18]
+
+    tailer = LogTailer(str(path), offset=os.path.getsize(path))
+    lines = draw_log_lines(3, first_age=20)
+    with open(path, "a") as f:
+        f.write(lines[:-10])
+    assert polled_ages(tailer) == [20, 21]
+    with open(path, "a") as f:
+        f.write(lines[-10:])
+    assert polled_ages(tailer) == [22]
+    assert polled_ages(tailer) == []
+    assert tailer.rows == 3
+
+
+# a log truncated in place, below the read offset, is read again from its start
+def test_truncated_log(tmp_path, draw_log_lines):
+    path = tmp_path / "log.csv"
+    path.write_text(draw_log_lines(5, header=True))
+    tailer = LogTailer(str(path))
+    assert len(polled_ages(tailer)) == 5
+
+    path.write_text(draw_log_lines(2, first_age=30, header=True))
+    assert polled_ages(tailer) == [30, 31]
+
+
+# a rotated log is drained of the lines appended before the rotation, then the new file at the same path
+# is followed from its start
+def test_rotated_log(tmp_path, draw_log_lines):
+    path = tmp_path / "log.csv"
+    path.write_text(draw_log_lines(4, header=True))
+    tailer = LogTailer(str(path))
+    assert len(polled_ages(tailer)) == 4
+
+    with open(path, "a") as f:
+        f.write(draw_log_lines(2, first_age=40))
+    os.rename(path, tmp_path / "log.csv.1")
+    path.write_text(draw_log_lines(3, first_age=50, header=True))
+    assert polled_ages(tailer) == [40, 41, 50, 51, 52]
+
+    with open(path, "a") as f:
+        f.write(draw_log_lines(1, first_age=60))
+    assert polled_ages(tailer) == [60]
+
+
+# malformed lines (a wrong number of fields, or values that do not parse) are skipped and logged, and the
+# other lines of their batch are kept
+def test_malformed_lines(tmp_path, draw_log_lines, caplog):
+    path = tmp_path / "log.csv"
+    lines = draw_log_lines(4).splitlines(keepends=True)
+    path.write_text(draw_log_lines(0, header=True) + lines[0] + "2024-07-26 10:00:00,10.0.0.1,GET\n" + lines[1]
+                    + lines[2].replace(",18,", ",abc,") + "not a log line\n" + lines[3])
+    tailer = LogTailer(str(path))
+    with caplog.at_level(logging.WARNING):
+        assert polled_ages(tailer) == [16, 17, 19]
+    assert "skipped 3 malformed lines" in caplog.text
@@ -0,0 +1,52 @@
+import ipaddress
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ip_index import IpIndex, address_range, parse_cidr
+
+
+# the first and last addresses of a block, including the whole address space and single addresses
+@pytest.mark.parametrize("text, first, last", [
+    ("0.0.0.0/0", 0, 2 ** 32 - 1),
+    ("192.168.1.7/32", 0xc0a80107, 0xc0a80107),
+    ("192.168.1.7", 0xc0a80107, 0xc0a80107),
+    ("10.1.2.3/8", 0x0a000000, 0x0affffff),
+    (" 172.16.0.0/12 ", 0xac100000, 0xac1fffff),
+    ("255.255.255.255/32", 2 ** 32 - 1, 2 ** 32 - 1),
+])
+def test_parse_cidr(text, first, last):
+    assert parse_cidr(text) == (first, last)
+
+
+# IPv6 addresses and malformed blocks are rejected
+@pytest.mark.parametrize("text", ["::1", "2001:db8::/32", "10.0.0.0/33", "10.0.0", "256.0.0.1", "", "bot"])
+def test_parse_cidr_rejects(text):
+    with pytest.raises(ValueError):
+        parse_cidr(text)
+
+
+# the rows of a range found by the index are those a scan of the column finds, for any block size; the
+# addresses include both ends of the address space
+@pytest.mark.parametrize("text", ["0.0.0.0/0", "0.0.0.0/32", "255.255.255.255/32", "192.168.1.7/32",
+                                  "128.0.0.0/1", "10.0.0.0/8", "192.168.0.0/16"])
+def test_rows_in_matches_scan(draw_addresses, text):
+    addresses = draw_addresses(20000, 5000)
+    addresses[:3] = [0, 2 ** 32 - 1, 0xc0a80107]
+    index = IpIndex.from_addresses(addresses)
+    first, last = parse_cidr(text)
+
+    network = ipaddress.IPv4Network(text)
+    expected = np.flatnonzero(pd.Series(addresses).map(lambda address: ipaddress.IPv4Address(int(address)) in network))
+    np.testing.assert_array_equal(index.rows_in(first, last), expected)
+
+
+# the range of sorted addresses is inclusive at both ends, and empty between stored addresses
+def test_address_range():
+    addresses = np.array([3, 5, 5, 9], dtype=np.uint32)
+    assert address_range(addresses, 5, 5) == slice(1, 3)
+    assert address_range(addresses, 0, 3) == slice(0, 1)
+    assert address_range(addresses, 6, 8) == slice(3, 3)
+    assert address_range(addresses, 0, 2 ** 32 - 1) == slice(0, 4)
+    assert address_range(addresses[:0], 0, 2 ** 32 - 1) == slice(0, 0)